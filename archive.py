@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+
+from brain import flatten_weights, unflatten_weights, weight_layout
+
+# Колонки жизни в сегменте: имя -> (dtype, форма на жизнь)
+COLUMNS = {
+    'tick': ('<i8', ()),       # Тик смерти
+    'role': ('i1', ()),
+    'generation': ('<i4', ()),
+    'mood': ('<f4', ()),
+    'score': ('<f4', ()),      # len(path) * (1 + mood), как top_score в Universe5
+    'coupled': ('?', ()),
+    'color': ('<f4', (3,)),
+    'genome': ('<f4', (3,)),   # s, r, b
+    'start': ('<f4', (3,)),    # Первая точка следа
+    'length': ('<i4', ()),
+    'offset': ('<i8', ()),     # Начало дельт следа в points сегмента
+}
+WEIGHTS = sum(int(np.prod(shape)) for _, shape in weight_layout())  # Веса NeuralMind одним вектором float16
+
+
+def encode_path(path):
+    """След (k, 3) -> первая точка float32 и k-1 дельт float16.
+
+    Дельты считаются от уже восстановленной точки, поэтому ошибка float16 не копится по следу.
+    """
+    start = path[0].astype(np.float32)
+    deltas = np.empty((len(path) - 1, 3), dtype=np.float16)
+    rec = start.copy()
+    for k in range(1, len(path)):
+        deltas[k - 1] = path[k] - rec
+        rec += deltas[k - 1].astype(np.float32)
+    return start, deltas
+
+
+def decode_path(start, deltas):
+    path = np.empty((len(deltas) + 1, 3), dtype=np.float32)
+    path[0] = start
+    np.cumsum(deltas.astype(np.float32), axis=0, out=path[1:])
+    path[1:] += start
+    return path
+
+
+class LifeArchive:
+    """Архив всех смертей на диске: горячее окно для рендера остается в EternalMemory, а сюда
+    дописывается каждая жизнь - след, цвет, роль, настроение, счет, геном и веса мозга.
+
+    Каталог:
+      meta.json             - колонки, емкость сегмента и индекс сегментов [первый тик, последний, жизней, точек]
+      seg_00000/<колонка>   - memmap колонки на capacity жизней; points - дельты следов float16
+      seg_00000/by_role.npy - при закрытии сегмента: номера жизней по (роль, тик) и начала ролей
+    Непустой каталог открывается только с resume=True (продолжение того же мира, например с чекпоинта):
+    flavor и world (World.identity - seed и метка создания) должны совпасть; тики смертей не идут назад. Открытый заново архив продолжает с нового сегмента.
+    meta.json переписывается каждые every жизней: после падения теряется не больше every последних смертей.
+    """
+
+    def __init__(self, path, flavor, trail=50, capacity=65536, resume=False, every=4096, world=None):
+        self.path, self.capacity, self.every = path, capacity, every
+        self.weights = flavor == 'neural'
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        self.meta = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            lives = sum(seg[2] for seg in meta['segments'])
+            if lives and not resume:
+                raise FileExistsError(f"{path} already holds an archive of {lives} lives; "
+                                      f"resume it or use an empty directory")
+            if lives and meta['flavor'] != flavor:
+                raise ValueError(f"{path} is a {meta['flavor']!r} archive, not {flavor!r}")
+            if lives and world is not None and meta.get('world') not in (None, world):
+                raise ValueError(f"{path} archives another world {meta['world']}, not {world}")
+            if lives: self.meta = meta
+        if self.meta is None:
+            columns = dict(COLUMNS)
+            if self.weights: columns['weights'] = ('<f2', (WEIGHTS,))
+            self.meta = {'flavor': flavor, 'world': world, 'capacity': capacity, 'points': capacity * trail,
+                         'columns': {name: [dtype, list(shape)] for name, (dtype, shape) in columns.items()},
+                         'segments': []}
+        self.maps = None
+        self.lives = self.points = 0
+        self.tick = max([seg[1] for seg in self.meta['segments']], default=0)  # Последний тик в архиве
+        self._write_meta()
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+    def _folder(self, s):
+        return os.path.join(self.path, 'seg_%05d' % s)
+
+    def _open_segment(self):
+        folder = self._folder(len(self.meta['segments']))
+        os.makedirs(folder, exist_ok=True)
+        # Папка могла остаться от сегмента, отрезанного truncate: его индекс по ролям уже чужой
+        stale = os.path.join(folder, 'by_role.npy')
+        if os.path.exists(stale):
+            os.remove(stale)
+        cap = self.meta['capacity']
+        self.maps = {name: np.memmap(os.path.join(folder, name), dtype, 'w+', shape=(cap,) + tuple(shape))
+                     for name, (dtype, shape) in self.meta['columns'].items()}
+        self.maps['points'] = np.memmap(os.path.join(folder, 'points'), '<f2', 'w+', shape=(self.meta['points'], 3))
+        self.lives = self.points = 0
+        self.meta['segments'].append([0, 0, 0, 0])
+
+    def _close_segment(self):
+        if self.maps is None: return
+        for m in self.maps.values():
+            m.flush()
+        k = self.lives
+        self._index(len(self.meta['segments']) - 1, self.maps['tick'][:k], self.maps['role'][:k])
+        self._write_meta()
+        self.maps = None
+
+    def _index(self, s, tick, role):
+        """by_role.npy: 4 границы ролей, затем номера жизней, отсортированные по (роль, тик)."""
+        order = np.lexsort((tick, role))
+        bounds = np.searchsorted(role[order], [0, 1, 2, 3])
+        np.save(os.path.join(self._folder(s), 'by_role.npy'), np.concatenate([bounds, order]).astype(np.int64))
+
+    def add(self, tick, path, color, role, mood, coupled, generation=0, genome=(0.0, 0.0, 0.0), weights=None):
+        """Одна смерть. Следы короче двух точек хранятся без дельт."""
+        if tick < self.tick:
+            raise ValueError(f"death at tick {tick} after tick {self.tick} already archived")
+        if self.maps is None or self.lives == self.meta['capacity'] or \
+                self.points + len(path) > self.meta['points']:
+            self._close_segment()
+            self._open_segment()
+        maps, row = self.maps, self.lives
+        path = np.asarray(path)
+        if len(path):
+            start, deltas = encode_path(path)
+            maps['start'][row] = start
+            maps['points'][self.points:self.points + len(deltas)] = deltas
+        maps['tick'][row], maps['role'][row], maps['generation'][row] = tick, role, generation
+        maps['mood'][row], maps['score'][row], maps['coupled'][row] = mood, len(path) * (1 + mood), coupled
+        maps['color'][row], maps['genome'][row] = color, genome
+        maps['length'][row], maps['offset'][row] = len(path), self.points
+        if self.weights and weights is not None:
+            maps['weights'][row] = flatten_weights(weights)
+        self.points += max(len(path) - 1, 0)
+        self.lives += 1
+        seg = self.meta['segments'][-1]
+        if seg[2] == 0: seg[0] = int(tick)
+        seg[1], seg[2], seg[3] = int(tick), self.lives, self.points
+        self.tick = int(tick)
+        if self.lives % self.every == 0:
+            # Сначала данные, потом индекс: meta.json не ссылается на жизни, которых нет на диске
+            for m in self.maps.values():
+                m.flush()
+            self._write_meta()
+
+    def truncate(self, tick):
+        """Забывает жизни после tick (продолжение с чекпоинта не дублирует смертей)."""
+        self._close_segment()
+        reader = ArchiveReader(self.path)
+        segments = self.meta['segments']
+        while segments and segments[-1][0] > tick:
+            segments.pop()
+            stale = os.path.join(self._folder(len(segments)), 'by_role.npy')
+            if os.path.exists(stale):
+                os.remove(stale)
+        if segments and segments[-1][1] > tick:
+            # Хвост последнего сегмента после tick отрезается; дописывать будем уже в новый сегмент
+            s = len(segments) - 1
+            ticks, role = reader._column(s, 'tick'), reader._column(s, 'role')
+            keep = int(np.searchsorted(ticks, tick, 'right'))
+            segments[s] = [segments[s][0], int(ticks[keep - 1]), keep, int(reader._column(s, 'offset')[keep])]
+            self._index(s, ticks[:keep], role[:keep])
+        self.tick = segments[-1][1] if segments else 0
+        self._write_meta()
+
+    def close(self):
+        self._close_segment()
+        self._write_meta()
+
+
+class ArchiveReader:
+    """Запросы к архиву без загрузки целиком: по диапазону тиков смерти и ролям."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        segments = np.array(self.meta['segments'], dtype=np.int64).reshape(-1, 4)
+        self.first, self.last, self.lives = segments[:, 0], segments[:, 1], segments[:, 2]
+
+    def __len__(self):
+        return int(self.lives.sum())
+
+    def _column(self, s, name):
+        path = os.path.join(self.path, 'seg_%05d' % s, name)
+        cap = self.meta['capacity']
+        if name == 'points':
+            return np.memmap(path, '<f2', 'r', shape=(self.meta['points'], 3))
+        dtype, shape = self.meta['columns'][name]
+        return np.memmap(path, dtype, 'r', shape=(cap,) + tuple(shape))[:self.lives[s]]
+
+    def _rows(self, s, start, stop, roles):
+        """Номера жизней сегмента s в диапазоне тиков; с roles - через индекс по ролям."""
+        ticks = self._column(s, 'tick')
+        lo = 0 if start is None else int(np.searchsorted(ticks, start, 'left'))
+        hi = len(ticks) if stop is None else int(np.searchsorted(ticks, stop, 'right'))
+        if roles is None:
+            return np.arange(lo, hi)
+        index = os.path.join(self.path, 'seg_%05d' % s, 'by_role.npy')
+        data = np.load(index) if os.path.exists(index) else None
+        if data is None or len(data) != 4 + len(ticks):
+            # Сегмент еще открыт или индекс остался от другой его версии - фильтр по колонке ролей
+            rows = np.arange(lo, hi)
+            return rows[np.isin(self._column(s, 'role')[lo:hi], roles)]
+        bounds, order = data[:4], data[4:]
+        parts = []
+        for r in roles:
+            rows = order[bounds[r]:bounds[r + 1]]
+            t = ticks[rows]
+            a = 0 if start is None else int(np.searchsorted(t, start, 'left'))
+            b = len(t) if stop is None else int(np.searchsorted(t, stop, 'right'))
+            parts.append(rows[a:b])
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def query(self, start=None, stop=None, roles=None, columns=None, paths=False):
+        """Жизни, умершие в [start, stop] с ролями roles: {колонка: массив}; с paths - еще и следы."""
+        columns = columns or [c for c in self.meta['columns'] if c not in ('offset', 'start')]
+        out = {name: [] for name in columns}
+        trails = []
+        for s in range(len(self.lives)):
+            # Сегменты проверяются все: тики растут только внутри сегмента
+            if stop is not None and self.first[s] > stop: continue
+            if start is not None and self.last[s] < start: continue
+            rows = self._rows(s, start, stop, roles)
+            for name in columns:
+                out[name].append(np.asarray(self._column(s, name)[rows]))
+            if paths:
+                trails += self._paths(s, rows)
+        result = {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in out.items()}
+        if paths:
+            result['paths'] = trails
+        return result
+
+    def _paths(self, s, rows):
+        points, start = self._column(s, 'points'), self._column(s, 'start')
+        offset, length = self._column(s, 'offset'), self._column(s, 'length')
+        return [decode_path(start[r], points[offset[r]:offset[r] + max(length[r] - 1, 0)]) if length[r] else
+                np.zeros((0, 3), dtype=np.float32) for r in rows]
+
+    def weights(self, row):
+        """Строка колонки weights -> словарь весов NeuralMind (как EternalMemory.best_weights)."""
+        return unflatten_weights(row)
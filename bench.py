@@ -0,0 +1,213 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import FLAVORS, World, make_config
+
+# Вариант движка -> исходный скрипт с объектами Agent (базовая линия для сравнения)
+SCRIPTS = {
+    'genome': 'Universe.py',
+    'roles': 'Universe 2.py',
+    'mood': 'Universe3.py',
+    'echo': 'Universe4.py',
+    'neural': 'Universe5.py',
+}
+
+
+def _percentiles(latency):
+    p50, p90, p99 = np.percentile(latency, [50, 90, 99]) * 1000.0
+    return {'p50_ms': float(p50), 'p90_ms': float(p90), 'p99_ms': float(p99)}
+
+
+def _timed(step, ticks, budget):
+    """Шагает до ticks раз или до исчерпания budget секунд (не меньше 5 шагов); латентность каждого шага."""
+    latency = []
+    started = time.perf_counter()
+    for k in range(ticks):
+        t0 = time.perf_counter()
+        step()
+        latency.append(time.perf_counter() - t0)
+        if k >= 4 and time.perf_counter() - started > budget: break
+    total = time.perf_counter() - started
+    return np.array(latency), total
+
+
+def _peak_memory(build, step, ticks, close=None):
+    """Пиковая память (tracemalloc, включая буферы NumPy) на постройку мира и несколько шагов.
+
+    Память самого Agg (буфер кадра в C++) tracemalloc не видит - только Python и NumPy.
+    """
+    tracemalloc.start()
+    try:
+        target = build()
+        for _ in range(ticks):
+            step(target)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if close is not None:
+        close(target)
+    return peak
+
+
+def _engine(flavor, n, seed, render):
+    """(шаг, закрытие, шаг рендера): мир движка, с render - вместе с Renderer на холсте Agg."""
+    world = World(make_config(flavor, n=n, seed=seed))
+    if not render:
+        return world.step, world.close, 1
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from render import VIEWS, Renderer
+    fig = plt.figure(figsize=(12, 9))
+    renderer = Renderer(fig.add_subplot(111, projection='3d'), world, VIEWS[flavor])
+    stride = VIEWS[flavor][0]
+
+    def step():
+        world.step()
+        if world.steps % stride == 0:
+            renderer.update()
+            fig.canvas.draw()
+
+    def close():
+        world.close()
+        plt.close(fig)
+
+    return step, close, stride
+
+
+def bench_engine(flavor, n, ticks, budget, render=False, seed=0):
+    """Движок на массивах: только симуляция или симуляция + рендер (Agg, с шагом рендера варианта)."""
+    step, close, stride = _engine(flavor, n, seed, render)
+    try:
+        latency, total = _timed(step, ticks, budget)
+    finally:
+        close()
+    # Память - на те же шаги, что и время: с рендером хотя бы один кадр
+    peak = _peak_memory(lambda: _engine(flavor, n, seed, render), lambda target: target[0](),
+                        max(min(5, ticks), stride), lambda target: target[1]())
+    return _row('engine', flavor, n, 'sim+render' if render else 'sim', latency, total, peak)
+
+
+def load_script(flavor):
+    """Исходный скрипт варианта как модуль.
+
+    Скрипты зовут matplotlib.use('TkAgg'), а без дисплея это ImportError: на время загрузки
+    ставится Agg, а use() ничего не делает - окно для замера симуляции не нужно.
+    """
+    import matplotlib
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPTS[flavor])
+    spec = importlib.util.spec_from_file_location('baseline_' + flavor, path)
+    module = importlib.util.module_from_spec(spec)
+    use = matplotlib.use
+    matplotlib.use('Agg')
+    matplotlib.use = lambda *args, **kwargs: None
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        matplotlib.use = use
+    return module
+
+
+def bench_baseline(flavor, n, ticks, budget):
+    """Базовая линия: исходные объекты Agent и цикл a.step(agents), только симуляция."""
+    module = load_script(flavor)
+    role_dist = dict(FLAVORS[flavor]['role_dist'])
+
+    def build():
+        mem = module.EternalMemory()
+        if flavor == 'genome':
+            return [module.Agent(mem, i) for i in range(n)]
+        return [module.Agent(mem, i, role_dist) for i in range(n)]
+
+    def step(agents):
+        if flavor in ('echo', 'neural'):
+            gm = np.mean([a.mood for a in agents])
+            gf = np.mean([a.fear for a in agents])
+            for a in agents: a.step(agents, gm, gf)
+        else:
+            for a in agents: a.step(agents)
+
+    agents = build()
+    latency, total = _timed(lambda: step(agents), ticks, budget)
+    peak = _peak_memory(build, step, min(5, ticks))
+    return _row('baseline', flavor, n, 'sim', latency, total, peak)
+
+
+def _row(engine, flavor, n, mode, latency, total, peak):
+    row = {'engine': engine, 'flavor': flavor, 'script': SCRIPTS[flavor], 'n': n, 'mode': mode,
+           'ticks': len(latency), 'ticks_per_sec': len(latency) / total if total else 0.0,
+           'peak_mb': peak / 2 ** 20}
+    row.update(_percentiles(latency))
+    return row
+
+
+def run_suite(flavors, sizes, ticks=200, budget=10.0, render=True, baseline_max=100, log=print, on_row=None):
+    """Все замеры по очереди. Упавший замер (нет зависимости, MemoryError) пропускается с записью
+    в failures; on_row(rows, failures) - после каждого замера, чтобы результаты не терялись."""
+    rows, failures = [], []
+    for flavor in flavors:
+        for n in sizes:
+            jobs = [('engine', False)] + ([('engine', True)] if render else [])
+            if n <= baseline_max:
+                jobs.append(('baseline', False))
+            for kind, with_render in jobs:
+                try:
+                    if kind == 'engine':
+                        row = bench_engine(flavor, n, ticks, budget, with_render)
+                    else:
+                        row = bench_baseline(flavor, n, ticks, budget)
+                except Exception as error:
+                    mode = 'sim+render' if with_render else 'sim'
+                    log(f" ! {kind} {flavor} n={n} {mode}: failed ({type(error).__name__}: {error})")
+                    failures.append({'engine': kind, 'flavor': flavor, 'n': n, 'mode': mode,
+                                     'error': f"{type(error).__name__}: {error}"})
+                    if on_row: on_row(rows, failures)
+                    continue
+                rows.append(row)
+                log(f"{row['engine']:8s} {flavor:7s} n={n:<6d} {row['mode']:10s} {row['ticks_per_sec']:9.1f} ticks/s "
+                    f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms peak={row['peak_mb']:.1f}MB")
+                if on_row: on_row(rows, failures)
+    return rows, failures
+
+
+def write_results(rows, out, failures=()):
+    """JSON с окружением + CSV рядом: удобно сравнивать прогоны и ловить регрессии."""
+    meta = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count()}
+    with open(out, 'w') as f:
+        json.dump({'meta': meta, 'results': rows, 'failures': list(failures)}, f, indent=2)
+    if rows:
+        with open(os.path.splitext(out)[0] + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Universe engines.')
+    parser.add_argument('--flavor', nargs='+', default=sorted(FLAVORS), choices=sorted(FLAVORS))
+    parser.add_argument('--n', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=10.0, help='max seconds per measurement')
+    parser.add_argument('--no-render', action='store_true', help='skip simulation+render measurements')
+    parser.add_argument('--baseline-max', type=int, default=100, help='largest N for the Python-object baseline')
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args()
+
+    # Результаты переписываются после каждого замера: падение (или OOM) позже их не теряет
+    rows, failures = run_suite(args.flavor, args.n, args.ticks, args.budget, not args.no_render, args.baseline_max,
+                               on_row=lambda rows, failures: write_results(rows, args.out, failures))
+    write_results(rows, args.out, failures)
+    print(f"--- Results: {args.out} ---")
+
+
+if __name__ == "__main__":
+    main()
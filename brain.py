@@ -0,0 +1,309 @@
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+BRAIN = ('W1', 'b1', 'W2', 'b2')
+
+
+def weight_layout(input_size=10, output_size=5, hidden_size=8):
+    """Веса NeuralMind из Universe5.py в плоском векторе: [(имя, форма)] в порядке W1, b1, W2, b2."""
+    return [('W1', (input_size, hidden_size)), ('b1', (1, hidden_size)),
+            ('W2', (hidden_size, output_size)), ('b2', (1, output_size))]
+
+
+def shared_arrays(spec, name=None):
+    """Массивы {имя: (форма, dtype)} подряд в одном блоке разделяемой памяти: (блок, {имя: массив}).
+
+    name=None - новый блок, иначе - подключение к готовому (в процессе обучения).
+    """
+    size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for shape, dtype in spec.values())
+    shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 1))
+    arrays, at = {}, 0
+    for key, (shape, dtype) in spec.items():
+        arrays[key] = np.ndarray(shape, dtype, buffer=shm.buf, offset=at)
+        at += arrays[key].nbytes
+    return shm, arrays
+
+
+def flatten_weights(weights, layout=None):
+    return np.concatenate([np.ravel(weights[name]) for name, _ in layout or weight_layout()])
+
+
+def unflatten_weights(flat, layout=None):
+    weights, at = {}, 0
+    for name, shape in layout or weight_layout():
+        size = int(np.prod(shape))
+        weights[name] = np.array(flat[at:at + size], dtype=float).reshape(shape)
+        at += size
+    return weights
+
+
+class PopulationMind:
+    """Мозги всей популяции в стопках тензоров: W1 (N, in, h), W2 (N, h, out).
+
+    Один forward/train - несколько einsum на всех агентов сразу; у каждого агента свои веса.
+    """
+
+    def __init__(self, n, input_size, output_size, hidden_size=8, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.shape = (input_size, hidden_size, output_size)
+        self.W1 = np.zeros((n, input_size, hidden_size))
+        self.b1 = np.zeros((n, hidden_size))
+        self.W2 = np.zeros((n, hidden_size, output_size))
+        self.b2 = np.zeros((n, output_size))
+        self.lr = 0.01
+        self.reset(np.arange(n))
+
+    def reset(self, idx):
+        """Новые случайные мозги для агентов idx."""
+        i, h, o = self.shape
+        self.W1[idx] = self.rng.standard_normal((len(idx), i, h)) * 0.1
+        self.b1[idx] = 0.0
+        self.W2[idx] = self.rng.standard_normal((len(idx), h, o)) * 0.1
+        self.b2[idx] = 0.0
+
+    def forward(self, inputs):
+        """inputs (N, in) -> out (N, out)."""
+        self.h = np.einsum('ni,nih->nh', inputs, self.W1) + self.b1
+        self.h_act = np.maximum(0, self.h)
+        self.out = np.einsum('nh,nho->no', self.h_act, self.W2) + self.b2
+        return self.out
+
+    def train(self, inputs, target, clip=None):
+        """Один шаг SGD для каждого агента на его собственном примере.
+
+        clip - необязательный предел ошибки (Huber), чтобы старый опыт не раскачивал веса.
+        """
+        error = self.forward(inputs) - target
+        if clip is not None:
+            error = np.clip(error, -clip, clip)
+        dh = np.einsum('no,nho->nh', error, self.W2)
+        dh[self.h <= 0] = 0
+        self.W2 -= self.lr * self.h_act[:, :, None] * error[:, None, :]
+        self.b2 -= self.lr * error
+        self.W1 -= self.lr * inputs[:, :, None] * dh[:, None, :]
+        self.b1 -= self.lr * dh
+
+    def get_weights(self, a):
+        """Веса агента a в формате NeuralMind - для наследования через EternalMemory.best_weights."""
+        return {'W1': self.W1[a].copy(), 'b1': self.b1[a][None, :].copy(),
+                'W2': self.W2[a].copy(), 'b2': self.b2[a][None, :].copy()}
+
+    def set_weights(self, idx, weights):
+        """Записывает одни и те же веса (формат NeuralMind) всем агентам idx."""
+        self.W1[idx] = weights['W1']
+        self.b1[idx] = np.reshape(weights['b1'], -1)
+        self.W2[idx] = weights['W2']
+        self.b2[idx] = np.reshape(weights['b2'], -1)
+
+    def spec(self):
+        return {name: (getattr(self, name).shape, np.float64) for name in BRAIN}
+
+    @classmethod
+    def wrap(cls, arrays, lr=0.01, rng=None):
+        """Мозги поверх готовых массивов {W1, b1, W2, b2} - без копии (например, в разделяемой памяти)."""
+        mind = cls.__new__(cls)
+        mind.rng, mind.lr = rng, lr
+        mind.W1, mind.b1, mind.W2, mind.b2 = (arrays[name] for name in BRAIN)
+        mind.shape = mind.W1.shape[1:] + mind.W2.shape[2:]
+        return mind
+
+    def copy(self):
+        return PopulationMind.wrap({name: getattr(self, name).copy() for name in BRAIN}, self.lr, self.rng)
+
+
+class ReplayBuffer:
+    """Опыт каждого агента: кольцо (N, depth) строк (inputs, target_out) на текущую жизнь агента.
+
+    add() пишет строку всем агентам сразу (O(1) векторная запись), перерождение обнуляет историю агента.
+    arrays - готовые массивы spec() (например, в разделяемой памяти); пишется только на месте.
+    """
+
+    def __init__(self, n, depth, input_size, output_size, arrays=None):
+        self.depth = depth
+        if arrays is None:
+            arrays = {name: np.zeros(shape, dtype) for name, (shape, dtype) in
+                      ReplayBuffer.spec(n, depth, input_size, output_size).items()}
+        self.inputs, self.target = arrays['inputs'], arrays['target']
+        self.filled, self.life, self.cursor = arrays['filled'], arrays['life'], arrays['head']
+
+    @staticmethod
+    def spec(n, depth, input_size, output_size):
+        return {'inputs': ((n, depth, input_size), np.float64), 'target': ((n, depth, output_size), np.float64),
+                'filled': ((n,), np.int64), 'life': ((n,), np.int64), 'head': ((1,), np.int64)}
+
+    @property
+    def head(self):
+        return int(self.cursor[0])
+
+    @head.setter
+    def head(self, value):
+        self.cursor[0] = value
+
+    def add(self, inputs, target, life):
+        reborn = life != self.life
+        self.filled[reborn] = 0
+        self.life[:] = life
+        self.inputs[:, self.head] = inputs
+        self.target[:, self.head] = target
+        self.head = (self.head + 1) % self.depth
+        np.minimum(self.filled + 1, self.depth, out=self.filled)
+
+    def sample(self, rng):
+        """По одной случайной строке текущей жизни на агента: (inputs, target, есть_ли_опыт)."""
+        n = len(self.filled)
+        back = (rng.random(n) * np.maximum(self.filled, 1)).astype(np.int64) + 1
+        rows = (self.head - back) % self.depth
+        idx = np.arange(n)
+        return self.inputs[idx, rows], self.target[idx, rows], self.filled > 0
+
+
+class Learner:
+    """Обучение вне горячего пути: мини-батчи из ReplayBuffer на теневой копии мозгов.
+
+    Актер (мир) только пишет опыт и раз в every тиков вызывает sync(): накопленная
+    разница весов публикуется агентам, чья жизнь не сменилась, затем тень перечитывает актера.
+    На каждый интервал между sync() приходится batches шагов обучения (по одной строке на агента):
+      по умолчанию - в самом тике, по ceil(batches / every) за тик, без всплеска в sync();
+      threaded=True - в потоке, параллельно тику, но под общим GIL: большой batches замедляет и тик;
+      process=True - в отдельном процессе: буфер опыта, тень и счетчики лежат в разделяемой памяти
+      (shared_arrays), тик платит только за запись строки опыта и копию весов в sync().
+    В фоне (поток, процесс) порядок обучения зависит от расписания - прогон не воспроизводится.
+    """
+
+    def __init__(self, mind, buffer, every=50, batches=50, threaded=False, rng=None, clip=1.0, process=False):
+        self.mind = mind
+        self.every, self.batches, self.clip = every, batches, clip
+        self.rng = rng if rng is not None else np.random.default_rng()
+        n, depth, input_size = buffer.inputs.shape
+        spec = ReplayBuffer.spec(n, depth, input_size, buffer.target.shape[2])
+        spec.update({'shadow_' + name: entry for name, entry in mind.spec().items()})
+        spec.update({'learner_life': ((n,), np.int64), 'counters': ((3,), np.int64)})  # budget, updates, стоп
+        self.shm = self.thread = self.process = None
+        if process:
+            self.shm, arrays = shared_arrays(spec)
+            self.lock = mp.Lock()
+            self._wake = mp.Condition(self.lock)
+        else:
+            arrays = {name: np.zeros(shape, dtype) for name, (shape, dtype) in spec.items()}
+            self.lock = threading.Lock()
+            self._wake = threading.Condition(self.lock)
+        self._attach(arrays, mind.lr)
+        for name in ('inputs', 'target', 'filled', 'life', 'cursor'):
+            getattr(self.buffer, name)[...] = getattr(buffer, name)
+        self.base = mind.copy()
+        self._pull(buffer.life)
+        if process:
+            self.process = mp.Process(target=_learn, daemon=True,
+                                      args=(self.shm.name, spec, mind.lr, clip, int(self.rng.integers(2 ** 63)),
+                                            self.lock, self._wake))
+            self.process.start()
+        elif threaded:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _attach(self, arrays, lr):
+        """Буфер, тень, жизни и счетчики - представления arrays: так их видят и актер, и процесс обучения."""
+        self.arrays = arrays
+        n, depth, input_size = arrays['inputs'].shape
+        self.buffer = ReplayBuffer(n, depth, input_size, arrays['target'].shape[2], arrays)
+        self.shadow = PopulationMind.wrap({name: arrays['shadow_' + name] for name in BRAIN}, lr)
+        self.life, self.counters = arrays['learner_life'], arrays['counters']
+
+    @property
+    def budget(self):
+        """Сколько шагов обучения еще разрешено до следующего sync()."""
+        return int(self.counters[0])
+
+    @budget.setter
+    def budget(self, value):
+        self.counters[0] = value
+
+    @property
+    def updates(self):
+        return int(self.counters[1])
+
+    @updates.setter
+    def updates(self, value):
+        self.counters[1] = value
+
+    def _pull(self, life):
+        for name in BRAIN:
+            getattr(self.shadow, name)[...] = getattr(self.mind, name)
+            getattr(self.base, name)[...] = getattr(self.mind, name)
+        self.life[...] = life
+
+    def add(self, inputs, target, life):
+        """Опыт тика в буфер - под замком: обучение в фоне читает те же строки в buffer.sample().
+
+        Без фона здесь же идет доля обучения этого тика.
+        """
+        with self.lock:
+            self.buffer.add(inputs, target, life)
+            if self.thread is None and self.process is None:
+                for _ in range(min(self.budget, -(-self.batches // self.every))):
+                    self.budget -= 1
+                    self.train_batch()
+
+    def train_batch(self):
+        """Один шаг SGD теневых мозгов: по строке опыта текущей жизни на каждого агента."""
+        inputs, target, ready = self.buffer.sample(self.rng)
+        ready &= self.buffer.life == self.life
+        if not ready.any(): return
+        before = [w[~ready].copy() for w in (self.shadow.W1, self.shadow.b1, self.shadow.W2, self.shadow.b2)]
+        self.shadow.train(inputs, target, self.clip)
+        for w, keep in zip((self.shadow.W1, self.shadow.b1, self.shadow.W2, self.shadow.b2), before):
+            w[~ready] = keep
+        self.updates += 1
+
+    def sync(self, life):
+        """Публикует выученное актеру. life - текущие номера жизней агентов (World.generation)."""
+        with self.lock:
+            same = life == self.life
+            for name in BRAIN:
+                live, shadow, base = getattr(self.mind, name), getattr(self.shadow, name), getattr(self.base, name)
+                live[same] += shadow[same] - base[same]
+            self._pull(life)
+            self.budget = self.batches
+            self._wake.notify()
+
+    def _run(self):
+        with self.lock:
+            while not self.counters[2]:
+                if self.budget > 0:
+                    self.budget -= 1
+                    self.train_batch()
+                    # Отпускаем замок между шагами, чтобы sync() не ждал весь бюджет
+                    self._wake.wait(0)
+                else:
+                    self._wake.wait()
+
+    def close(self):
+        with self.lock:
+            self.counters[2] = 1
+            self._wake.notify()
+        if self.thread is not None:
+            self.thread.join()
+        if self.process is not None:
+            self.process.join()
+            self.process = None
+            # Дальше (финальный чекпоинт) мозги и опыт читаются из своей копии, блок освобождается
+            self._attach({name: array.copy() for name, array in self.arrays.items()}, self.mind.lr)
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def _learn(name, spec, lr, clip, seed, lock, wake):
+    """Процесс обучения Learner(process=True): тот же цикл _run над разделяемой памятью."""
+    shm, arrays = shared_arrays(spec, name)
+    learner = Learner.__new__(Learner)
+    learner.clip, learner.rng, learner.lock, learner._wake = clip, np.random.default_rng(seed), lock, wake
+    learner._attach(arrays, lr)
+    try:
+        learner._run()
+    finally:
+        learner = arrays = None
+        shm.close()
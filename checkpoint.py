@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from engine import World
+
+# Массивы мира, которые сохраняются как есть
+WORLD_ARRAYS = ('pos', 'role', 'energy', 'mood', 'fear', 'color', 's', 'r', 'b', 'coupled', 'generation')
+MEMORY_ARRAYS = ('trails', 'length', 'color', 'alpha', 'lw', 'role')
+BRAIN_ARRAYS = ('W1', 'b1', 'W2', 'b2')
+REPLAY_ARRAYS = ('inputs', 'target', 'filled', 'life')
+
+
+def snapshot(world):
+    """Полный слепок мира: плоский словарь массивов (копии, мир можно сразу шагать дальше)."""
+    mem = world.mem
+    state = {'config': json.dumps(world.config), 'rng': json.dumps(world.rng.bit_generator.state),
+             'counters': np.array([world.steps, world.metamorphoses, mem.head, mem.count, mem.version,
+                                   mem.total_deaths, mem.legendary_lives, world.trails.head]),
+             'top_score': np.array(mem.top_score)}
+    for name in WORLD_ARRAYS:
+        state['world_' + name] = getattr(world, name).copy()
+    state['trail_buf'] = world.trails.buf.copy()
+    state['trail_length'] = world.trails.length.copy()
+    for name in MEMORY_ARRAYS:
+        state['mem_' + name] = getattr(mem, name).copy()
+    state['records_g'] = np.array([r['g'] for r in mem.records], dtype=float).reshape(-1, 3)
+    state['records_c'] = np.array([r['c'] for r in mem.records], dtype=float).reshape(-1, 3)
+    if mem.best_weights:
+        for name in BRAIN_ARRAYS:
+            state['best_' + name] = np.asarray(mem.best_weights[name])
+    if world.flavor == 'neural':
+        for name in BRAIN_ARRAYS:
+            state['brain_' + name] = getattr(world.brain, name).copy()
+    learner = getattr(world, 'learner', None)
+    if learner is not None:
+        # Опыт и теневые мозги Learner'а: после восстановления обучение продолжается с того же места
+        with learner.lock:
+            for name in REPLAY_ARRAYS:
+                state['replay_' + name] = getattr(learner.buffer, name).copy()
+            for name in BRAIN_ARRAYS:
+                state['shadow_' + name] = getattr(learner.shadow, name).copy()
+                state['base_' + name] = getattr(learner.base, name).copy()
+            state['learner_life'] = learner.life.copy()
+            state['learner_counters'] = np.array([learner.buffer.head, learner.budget, learner.updates])
+            state['learner_rng'] = json.dumps(learner.rng.bit_generator.state)
+    return state
+
+
+def restore(state):
+    """Мир из слепка: тот же мир, с того же тика, с тем же генератором случайностей."""
+    config = json.loads(str(state['config']))
+    # Архив этого мира уже не пуст: открывается на продолжение, когда мир восстановлен
+    world = World(dict(config, archive=None))
+    world.rng.bit_generator.state = json.loads(str(state['rng']))
+    mem = world.mem
+    (world.steps, world.metamorphoses, mem.head, mem.count, mem.version,
+     mem.total_deaths, mem.legendary_lives, world.trails.head) = (int(c) for c in state['counters'])
+    mem.top_score = float(state['top_score'])
+    for name in WORLD_ARRAYS:
+        getattr(world, name)[...] = state['world_' + name]
+    world.trails.buf[...] = state['trail_buf']
+    world.trails.length[...] = state['trail_length']
+    for name in MEMORY_ARRAYS:
+        getattr(mem, name)[...] = state['mem_' + name]
+    mem.records.clear()
+    for g, c in zip(state['records_g'], state['records_c']):
+        mem.records.append({'g': list(g), 'c': c})
+    if 'best_W1' in state:
+        mem.best_weights = {name: np.array(state['best_' + name]) for name in BRAIN_ARRAYS}
+    if world.flavor == 'neural':
+        for name in BRAIN_ARRAYS:
+            getattr(world.brain, name)[...] = state['brain_' + name]
+    learner = getattr(world, 'learner', None)
+    if learner is not None and 'learner_life' in state:
+        with learner.lock:
+            for name in REPLAY_ARRAYS:
+                getattr(learner.buffer, name)[...] = state['replay_' + name]
+            for name in BRAIN_ARRAYS:
+                getattr(learner.shadow, name)[...] = state['shadow_' + name]
+                getattr(learner.base, name)[...] = state['base_' + name]
+            learner.life[...] = state['learner_life']
+            learner.buffer.head, learner.budget, learner.updates = (int(c) for c in state['learner_counters'])
+            learner.rng.bit_generator.state = json.loads(str(state['learner_rng']))
+    world.stats.refresh(world)
+    if config.get('archive'):
+        world.open_archive(config['archive'], resume=True)
+        world.archive.truncate(world.steps)
+    return world
+
+
+def save(world, path):
+    """Один несжатый .npz: запись занимает миллисекунды."""
+    write(snapshot(world), path)
+
+
+def write(state, path):
+    # Пишем во временный файл и подменяем атомарно: оборванная запись не портит прошлый чекпоинт
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **state)
+    os.replace(tmp, path)
+
+
+def load(path):
+    with np.load(path, allow_pickle=False) as data:
+        return restore({key: data[key] for key in data.files})
+
+
+class Checkpointer:
+    """Периодический чекпоинт без остановки цикла: слепок снимается в тике, а пишется в фоне.
+
+    Если прошлая запись еще идет, очередной чекпоинт пропускается, а не ждет.
+    """
+
+    def __init__(self, path, every=1000):
+        self.path, self.every = path, every
+        self.thread = None
+        self.saved = 0
+        self.skipped = 0
+
+    def maybe(self, world):
+        if world.steps % self.every: return False
+        if self.thread is not None and self.thread.is_alive():
+            self.skipped += 1
+            return False
+        state = snapshot(world)
+        self.thread = threading.Thread(target=self._write, args=(state,), daemon=True)
+        self.thread.start()
+        return True
+
+    def _write(self, state):
+        write(state, self.path)
+        self.saved += 1
+
+    def close(self, world=None):
+        """Дожидается фоновой записи; с world - еще и финальный слепок.
+
+        world передается только на границе тика (run_headless): мир, прерванный посреди step(),
+        не перезаписывает последний целый чекпоинт.
+        """
+        if self.thread is not None:
+            self.thread.join()
+        if world is not None:
+            save(world, self.path)
+            self.saved += 1
@@ -0,0 +1,785 @@
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from archive import LifeArchive
+from spatial import CellList, RoleTrees
+from brain import Learner, PopulationMind, ReplayBuffer
+from integrators import integrate, lorenz
+from profiler import TickProfiler
+from stats import PopulationStats
+
+# Коды ролей: вся популяция хранится в плоских массивах, роль - это просто число
+SOUL, PARASITE, JUDGE = 0, 1, 2
+ROLES = ('soul', 'parasite', 'judge')
+
+# Каждый вариант Вселенной - это конфигурация одного движка
+FLAVORS = {
+    # Universe.py: одни души, геном Лоренца наследуется от ушедших
+    'genome': {
+        'dt': 0.005, 'trail': 40, 'canvas': 250, 'records': 5, 'spawn': 5.0, 'bound': None,
+        'role_dist': {'judge': 0.0, 'parasite': 0.0},
+        'birth': {'soul': {'energy': (1.5, 3.0)}},
+        'loss': (0.004, 0.004, 0.004),
+        'rules': [
+            # Порог узнавания "своего": только ближайшая душа
+            {'actor': 'soul', 'target': 'soul', 'radius': 5.0, 'nearest': True, 'gain': 0.5, 'blend': 0.99},
+        ],
+    },
+    # "Universe 2.py": души, паразиты и судьи
+    'roles': {
+        'dt': 0.006, 'trail': 50, 'canvas': 300, 'records': 8, 'spawn': 10.0, 'bound': 60.0,
+        'role_dist': {'judge': 0.1, 'parasite': 0.2},
+        'birth': {'judge': {'color': (1.0, 1.0, 1.0), 'energy': (5.0, 5.0)},
+                  'parasite': {'color': (0.1, 0.0, 0.0), 'energy': (2.0, 2.0)},
+                  'soul': {'tint': (0.3, 1.0), 'energy': (2.0, 3.5)}},
+        'loss': (0.005, 0.008, 0.002),
+        'rules': [
+            {'actor': 'soul', 'target': 'soul', 'radius': 6.0, 'gain': 0.8, 'blend': 0.98},
+            {'actor': 'soul', 'target': 'parasite', 'radius': 8.0, 'gain': -1.5},
+            {'actor': 'soul', 'target': 'judge', 'radius': 5.0, 'orbit': 2.0},
+            {'actor': 'parasite', 'target': 'soul', 'radius': 15.0, 'gain': 1.2},
+            {'actor': 'parasite', 'target': 'judge', 'radius': 10.0, 'gain': -3.0},
+            {'actor': 'parasite', 'target': 'soul', 'radius': 2.0, 'energy': (0.05, -0.08), 'redden': 0.05},
+            {'actor': 'judge', 'target': 'any', 'radius': 6.0, 'gain': -5.0, 'energy': (0.0, -0.01)},
+        ],
+    },
+    # Universe3.py: настроение, страх и метаморфоза
+    'mood': {
+        'dt': 0.006, 'trail': 50, 'canvas': 250, 'records': 10, 'spawn': 15.0, 'bound': 100.0,
+        'role_dist': {'judge': 0.05, 'parasite': 0.20},
+        'birth': {'judge': {'color': (1.0, 1.0, 1.0), 'energy': (10.0, 10.0)},
+                  'parasite': {'color': (0.2, 0.0, 0.0), 'energy': (4.0, 4.0)},
+                  'soul': {'tint': (0.4, 0.9), 'energy': (3.0, 6.0)}},
+        'mood': 0.2, 'judge_lw': 1.5, 'broken': (0.3, 0.0, 0.0), 'perception': 12.0,
+        # Счастливые тратят меньше: расход loss[роль] * (1.2 - 0.3 * mood)
+        'loss': (0.006, 0.006, 0.006), 'drain': (1.2, 0.3),
+        'rules': [
+            {'actor': 'soul', 'target': 'soul', 'radius': 7.0, 'when': 'seek_love', 'gain': 1.5, 'blend': 0.99},
+            {'actor': 'soul', 'target': 'threat', 'radius': 10.0, 'gain': -2.5},  # Бегство
+            {'actor': 'parasite', 'target': 'soul', 'radius': 15.0, 'gain': 1.2},  # Преследование
+            {'actor': 'parasite', 'target': 'soul', 'radius': 2.0, 'energy': (0.1, -0.2), 'mood': (0.0, -0.2),
+             'redden': 0.05},
+            {'actor': 'judge', 'target': 'any', 'radius': 6.0, 'gain': -10.0, 'energy': (0.0, -0.05)},  # Очищение
+        ],
+    },
+    # Universe4.py: слух (глобальное настроение), зрение и шум
+    'echo': {
+        'dt': 0.006, 'trail': 40, 'canvas': 200, 'records': 10, 'spawn': 15.0, 'bound': 120.0,
+        'vision': 35.0, 'role_dist': {'judge': 0.05, 'parasite': 0.20},
+        'birth': {'judge': {'color': (1.0, 1.0, 1.0), 'energy': (10.0, 10.0)},
+                  'parasite': {'color': (0.2, 0.0, 0.0), 'energy': (4.0, 4.0)},
+                  'soul': {'tint': (0.4, 0.9), 'energy': (4.0, 7.0)}},
+        'mood': 0.1, 'judge_lw': 1.8, 'broken': (0.4, 0.0, 0.0),
+        'loss': (0.007, 0.007, 0.007), 'drain': (1.1, 0.2),
+        'rules': [
+            {'actor': 'soul', 'target': 'threat', 'radius': 10.0, 'gain': -3.0},
+            {'actor': 'soul', 'target': 'soul', 'radius': 5.0, 'couple': True},
+            {'actor': 'parasite', 'target': 'soul', 'radius': 2.5, 'energy': (0.15, -0.2), 'mood': (0.0, -0.3)},
+            {'actor': 'judge', 'target': 'any', 'radius': 8.0, 'gain': -15.0, 'energy': (0.0, -0.1)},
+        ],
+    },
+    # Universe5.py: у каждого агента свой NeuralMind, лучший мозг наследуется
+    'neural': {
+        'dt': 0.006, 'trail': 40, 'canvas': 150, 'records': 10, 'spawn': 15.0, 'bound': 170.0,
+        'vision': 40.0, 'role_dist': {'judge': 0.05, 'parasite': 0.25},
+        'birth': {'judge': {'color': (1.0, 1.0, 1.0), 'energy': (20.0, 20.0)},
+                  'parasite': {'color': (0.4, 0.0, 0.0), 'energy': (6.0, 12.0)},
+                  'soul': {'tint': (0.4, 0.9), 'energy': (6.0, 12.0)}},
+        'loss': (0.009, 0.009, 0.009), 'drain': (1.1, 0.3),
+        'rules': [
+            {'actor': 'soul', 'target': 'soul', 'radius': 5.0, 'couple': True, 'cheer': 0.02},
+            # Бегство с силой, которую выбрал мозг (decision[4])
+            {'actor': 'soul', 'target': 'threat', 'radius': 12.0, 'gain': -1.0, 'scale': 'flee_gain', 'fear': 0.8},
+        ],
+    },
+}
+
+
+def make_config(flavor='mood', **overrides):
+    """Собирает конфигурацию мира: параметры варианта + n, seed и любые замены."""
+    config = dict(FLAVORS[flavor])
+    config.update({'flavor': flavor, 'n': 12, 'seed': None, 'integrator': 'euler', 'substeps': 1,
+                   # Обучение NeuralMind: 'online' - шаг SGD каждый тик, 'replay' - Learner с буфером опыта
+                   'learning': 'online', 'replay': 64, 'learn_every': 50, 'learn_batches': 50,
+                   # Где учится Learner: в тике (по умолчанию), в потоке или в отдельном процессе
+                   'learn_thread': False, 'learn_process': False,
+                   # Профайлер тика: включается и на лету через world.profiler.enabled
+                   'profile': False, 'profile_window': 1000,
+                   # Окно скользящих рядов статистики популяции (тиков)
+                   'stats_window': 1000,
+                   # Потоков на проход по парам (1 - без пула). Части прохода от числа потоков не зависят
+                   # и сливаются по порядку - результат тот же при любом числе; другой spatial.BLOCK
+                   # меняет порядок сложения, то есть округление (~1e-16)
+                   'workers': 1,
+                   # Каталог архива всех смертей на диске (None - только горячее окно EternalMemory)
+                   'archive': None})
+    config.update(overrides)
+    return config
+
+
+def _scatter(idx, values, n):
+    """Сумма значений по индексам агентов (векторный аналог цикла `+=`)."""
+    if values.ndim == 1:
+        return np.bincount(idx, weights=values, minlength=n)
+    return np.stack([np.bincount(idx, weights=values[:, k], minlength=n) for k in range(values.shape[1])], axis=1)
+
+
+# Кого правило касается: имя роли, 'threat' (паразиты и судьи) или 'any'
+TARGETS = {'soul': (SOUL,), 'parasite': (PARASITE,), 'judge': (JUDGE,), 'threat': (PARASITE, JUDGE),
+           'any': (SOUL, PARASITE, JUDGE)}
+
+
+class RuleTable:
+    """Таблица правил взаимодействия, скомпилированная в один векторный проход по парам соседей.
+
+    Правило - словарь: actor, target (см. TARGETS), radius и эффекты на каждую пару (actor, target):
+      gain    - сила воли vec * gain (при пересечении правил действует последнее в таблице)
+      scale   - имя массива мира (n,), на который умножается gain актера
+      orbit   - вращение вокруг цели (vec_y, -vec_x, 0) * orbit
+      energy  - (актеру, цели), mood - (актеру, цели): прибавки за каждую пару
+      redden  - покраснение актера за каждую пару, blend - смешивание цвета (keep), couple - пара
+      cheer   - настроение актера сразу, не выше 1; fear - страх актера становится таким
+      when    - имя булева массива мира (n,): условие на актера
+      nearest - только ближайшая подходящая цель (запрос к KD-дереву, а не проход по парам;
+                такие правила складываются с остальными, а не перекрываются ими)
+    """
+
+    def __init__(self, rules):
+        self.rules = [dict(rule) for rule in rules]
+        # Таблица ролей: ok[k, 3 * роль актера + роль цели] - подходит ли пара правилу k
+        self.ok = np.zeros((len(self.rules), 9), dtype=bool)
+        for r, rule in enumerate(self.rules):
+            for a in TARGETS[rule['actor']]:
+                self.ok[r, [3 * a + t for t in TARGETS[rule.get('target', 'any')]]] = True
+        self.radius = np.array([rule['radius'] for rule in self.rules], dtype=float).reshape(-1, 1)
+        # Для каждого эффекта - только правила, где он есть: проход не тратится на нули
+        effect = lambda name: [(r, rule[name]) for r, rule in enumerate(self.rules) if rule.get(name)]
+        self.gain = [(r, rule['gain'], rule.get('scale')) for r, rule in enumerate(self.rules) if 'gain' in rule]
+        self.orbit, self.redden, self.cheer = effect('orbit'), effect('redden'), effect('cheer')
+        self.energy, self.mood = effect('energy'), effect('mood')
+        self.couple, self.blend, self.fear = effect('couple'), effect('blend'), effect('fear')
+        self.when, self.nearest = effect('when'), effect('nearest')
+        # Дальность прохода по парам для каждой роли актера: пары дальше не нужны ни одному правилу
+        self.reach = np.zeros(3)
+        for rule in self.rules:
+            if rule.get('nearest'): continue
+            for a in TARGETS[rule['actor']]:
+                self.reach[a] = max(self.reach[a], rule['radius'])
+
+    def masks(self, world, pairs):
+        """Матрица (правила, пары): какая пара попадает под какое правило."""
+        i, j, vec, dist = pairs
+        code = 3 * world.role[i].astype(np.intp) + world.role[j]
+        m = self.ok[:, code] & (dist < self.radius)
+        for r, name in self.when:
+            m[r] &= getattr(world, name)[i]
+        for r, _ in self.nearest:
+            m[r] = False
+        return m
+
+    def _nearest_pairs(self, world, r):
+        """Пары (актер, ближайшая цель) правила r одним запросом k=2 к KD-дереву целей - O(N log N)."""
+        rule = self.rules[r]
+        trees = RoleTrees(world.pos, world.role, {'target': TARGETS[rule.get('target', 'any')]})
+        dist, target = trees.nearest('target', rule['radius'])
+        i = np.flatnonzero((target >= 0) & np.isin(world.role, TARGETS[rule['actor']]))
+        if rule.get('when'):
+            i = i[getattr(world, rule['when'])[i]]
+        j = target[i]
+        m = np.zeros((len(self.rules), len(i)), dtype=bool)
+        m[r] = True
+        return (i, j, world.pos[j] - world.pos[i], dist[i]), m
+
+    def accumulate(self, world, pairs, out, m=None):
+        """Вклад пар в буфер изменений out (Deltas). Состояние мира только читается.
+
+        Поэтому пары можно делить между потоками: у каждой части свой Deltas, потом merge.
+        m - готовая матрица (правила, пары) вместо masks().
+        """
+        n = world.n
+        i, j, vec, dist = pairs
+        out.pairs += len(i)
+        if len(i) == 0: return out
+        m = self.masks(world, pairs) if m is None else m
+        hits = lambda r, who: np.bincount(who[m[r]], minlength=n)
+
+        # Сила воли: на каждую пару действует последнее подходящее правило с gain
+        gain = np.zeros(len(i))
+        for r, g, scale in self.gain:
+            gain[m[r]] = g if scale is None else g * getattr(world, scale)[i[m[r]]]
+        for r, g in self.orbit:
+            v = vec[m[r]]
+            out.force += _scatter(i[m[r]], np.stack([v[:, 1], -v[:, 0], np.zeros(len(v))], axis=1) * g, n)
+        out.force += _scatter(i, vec * gain[:, None], n)
+
+        for r, (actor, target) in self.energy:
+            out.energy += hits(r, i) * actor + hits(r, j) * target
+            out.contacts += int(m[r].sum())
+        for r, (actor, target) in self.mood:
+            out.mood += hits(r, i) * actor + hits(r, j) * target
+
+        for r, value in self.redden:
+            out.redden += value * hits(r, i)
+        for r, value in self.cheer:
+            out.cheer += value * hits(r, i)
+        for r, _ in self.couple:
+            out.couple[i[m[r]]] = True
+        for r, keep in self.blend:
+            # Цвета партнеров берутся из состояния до тика: смешивание не зависит от порядка пар
+            count, total = out.blend.setdefault(r, (np.zeros(n), np.zeros((n, 3))))
+            count += hits(r, i)
+            total += _scatter(i[m[r]], world.color[j[m[r]]], n)
+        for r, _ in self.fear:
+            out.fear.setdefault(r, np.zeros(n, dtype=bool))[i[m[r]]] = True
+        return out
+
+    def commit(self, world, out):
+        """Применяет накопленные изменения цвета, настроения, пар и страха одним шагом."""
+        if out.redden.any():
+            world.color[:, 0] = np.clip(world.color[:, 0] + out.redden, 0, 1)
+        if out.cheer.any():
+            world.mood = np.where(out.cheer > 0, np.minimum(1.0, world.mood + out.cheer), world.mood)
+        world.coupled |= out.couple
+        for r, keep in self.blend:
+            if r not in out.blend: continue
+            # c = c*keep + other*(1-keep) последовательно по всем партнерам = смесь со средним партнером
+            count, total = out.blend[r]
+            hit = count > 0
+            w = keep ** count[hit, None]
+            world.color[hit] = world.color[hit] * w + total[hit] / count[hit, None] * (1 - w)
+            world.coupled[hit] = True
+        for r, value in self.fear:
+            if r in out.fear:
+                world.fear[out.fear[r]] = value
+        world.profiler.count('contacts', out.contacts)
+
+    def span(self, perceive=None):
+        """Дальность прохода по парам для каждой роли актера: правила и радиус восприятия perceive."""
+        return self.reach if perceive is None else np.maximum(self.reach, perceive[0])
+
+    def apply(self, world, force, d_energy, d_mood, pool=None, perceive=None):
+        """Один синхронный проход: все пары читают одно и то же состояние, изменения копятся в Deltas.
+
+        Пары строятся частями по актерам (CellList.blocks), каждая роль - на свою дальность
+        (world.cells); часть сразу сворачивается в свой Deltas, поэтому в памяти не больше одной
+        части на поток. С pool (ThreadPoolExecutor) части считаются параллельно; части зависят только
+        от мира, а Deltas сливаются в их порядке, поэтому итог от пула не зависит.
+        perceive = (радиус, f(q, pairs)) - восприятие по тем же парам до правил: у актеров q
+        в части все их соседи.
+        """
+        n = world.n
+        out = Deltas(n, force, d_energy, d_mood)
+        for r, _ in self.nearest:
+            pairs, m = self._nearest_pairs(world, r)
+            out.merge(self.accumulate(world, pairs, Deltas(n), m))
+        reach = self.span(perceive)
+        parts = [(q, reach[code]) for code in range(3) if reach[code] > 0
+                 for q in world.cells(reach[code]).blocks(np.flatnonzero(world.role == code), reach[code])]
+
+        def part(job):
+            q, radius = job
+            pairs = world.cells(radius).pairs(radius, query=q)
+            if perceive is not None:
+                perceive[1](q, pairs)
+            return self.accumulate(world, pairs, Deltas(n))
+
+        for delta in (map if pool is None else pool.map)(part, parts):
+            out.merge(delta)
+        self.commit(world, out)
+        return out
+
+
+class Deltas:
+    """Буфер записи тика: все изменения от пар копятся здесь, а не в массивах мира.
+
+    Мир в это время - буфер чтения (состояние до тика); commit применяет буфер целиком.
+    """
+
+    def __init__(self, n, force=None, energy=None, mood=None):
+        self.force = np.zeros((n, 3)) if force is None else force
+        self.energy = np.zeros(n) if energy is None else energy
+        self.mood = np.zeros(n) if mood is None else mood
+        self.redden = np.zeros(n)
+        self.cheer = np.zeros(n)
+        self.couple = np.zeros(n, dtype=bool)
+        self.blend = {}  # правило -> (число партнеров, сумма их цветов)
+        self.fear = {}  # правило -> маска актеров
+        self.contacts = 0
+        self.pairs = 0
+
+    def merge(self, other):
+        self.force += other.force
+        self.energy += other.energy
+        self.mood += other.mood
+        self.redden += other.redden
+        self.cheer += other.cheer
+        self.couple |= other.couple
+        for r, (count, total) in other.blend.items():
+            if r in self.blend:
+                self.blend[r][0][...] += count
+                self.blend[r][1][...] += total
+            else:
+                self.blend[r] = (count, total)
+        for r, mask in other.fear.items():
+            self.fear[r] = self.fear[r] | mask if r in self.fear else mask
+        self.contacts += other.contacts
+        self.pairs += other.pairs
+
+class EternalMemory:
+    """Память Вселенной: хранит следы тех, кто ушел.
+
+    Следы лежат в заранее выделенном кольце массивов: сохранение и вытеснение - O(1),
+    а рендер забирает всю память одним пакетом без копирования (batch()).
+    """
+
+    def __init__(self, config):
+        self.flavor = config['flavor']
+        self.capacity = cap = config['canvas']
+        self.maxlen = config['trail']
+        self.judge_lw = config.get('judge_lw', 1.5)
+        self.records = deque(maxlen=config['records'])
+
+        self.trails = np.zeros((cap, self.maxlen, 3))
+        self.length = np.zeros(cap, dtype=np.int32)
+        self.color = np.zeros((cap, 3))
+        self.alpha = np.zeros(cap)
+        self.lw = np.zeros(cap)
+        self.role = np.zeros(cap, dtype=np.int8)
+        self.stamp = np.zeros(cap, dtype=np.int64)  # version на момент записи слота: по нему кешируется LOD
+        self.head = 0  # Следующий слот для записи (самый старый след, если кольцо заполнено)
+        self.count = 0
+
+        self.version = 0  # Растет при каждом изменении следов: рендер перестраивает их только тогда
+        self.total_deaths = 0
+        self.legendary_lives = 0
+        self.top_score = -np.inf
+        self.best_weights = None
+
+    def __len__(self):
+        return self.count
+
+    def style(self, role, mood, coupled):
+        """Прозрачность, толщина и цвет следа зависят от роли и настроения в момент смерти."""
+        if self.flavor == 'genome':
+            return (0.4, 1.0) if coupled else (0.1, 0.4)
+        if self.flavor == 'roles':
+            return {SOUL: (0.3, 1.2), JUDGE: (0.5, 2.0), PARASITE: (0.1, 0.8)}[role]
+        brightness = np.clip(0.5 + mood * 0.5, 0.1, 1.0)
+        if self.flavor == 'neural':
+            return 0.2 * brightness, 0.7
+        if role == JUDGE:
+            return 0.4, self.judge_lw
+        return (0.3 if role == SOUL else 0.1) * brightness, (1.2 if role == SOUL else 0.6)
+
+    def save(self, path, color, role, mood=0.0, coupled=False, weights=None):
+        self.total_deaths += 1
+        if len(path) > 10:
+            alpha, lw = self.style(role, mood, coupled)
+            if role == JUDGE and self.flavor in ('mood', 'echo'):
+                color = (1.0, 1.0, 1.0)
+            # Запись поверх самого старого следа
+            slot, k = self.head, min(len(path), self.maxlen)
+            self.trails[slot, :k] = path[len(path) - k:]
+            self.length[slot] = k
+            self.color[slot], self.alpha[slot], self.lw[slot], self.role[slot] = color, alpha, lw, role
+            self.head = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.version += 1
+            self.stamp[slot] = self.version
+
+            if role == SOUL and weights:
+                score = len(path) * (1 + mood)
+                if score > 100: self.legendary_lives += 1
+                if score > self.top_score:
+                    self.top_score = score
+                    self.best_weights = weights
+
+    def order(self):
+        """Индексы занятых слотов от старого к новому."""
+        return (self.head - self.count + np.arange(self.count)) % self.capacity
+
+    def batch(self):
+        """Вся память одним пакетом: представления (views) занятых слотов, без копий.
+
+        Пока кольцо не заполнено, заняты слоты [0, count); после - все.
+        """
+        c = self.count
+        return {'trails': self.trails[:c], 'length': self.length[:c], 'color': self.color[:c],
+                'alpha': self.alpha[:c], 'lw': self.lw[:c], 'role': self.role[:c], 'stamp': self.stamp[:c]}
+
+
+class TrailBuffer:
+    """Хвосты живых: один общий кольцевой буфер (N, 2L, 3) вместо deque на каждого агента.
+
+    Все агенты шагают вместе, поэтому голова (head) общая, а длина хвоста - своя у каждого.
+    Каждая точка пишется дважды (в столбцы p и p + L), поэтому последние L точек
+    всегда лежат непрерывно и читаются срезом-представлением без копий.
+    """
+
+    def __init__(self, n, maxlen):
+        self.maxlen = maxlen
+        self.buf = np.zeros((n, 2 * maxlen, 3))
+        self.length = np.zeros(n, dtype=np.int32)
+        self.head = maxlen - 1  # Столбец последней записи во второй половине буфера
+
+    def append(self, pos):
+        """Добавляет текущие позиции всей популяции - две векторные записи."""
+        p = (self.head + 1) % self.maxlen
+        self.buf[:, p] = pos
+        self.buf[:, p + self.maxlen] = pos
+        self.head = p + self.maxlen
+        np.minimum(self.length + 1, self.maxlen, out=self.length)
+
+    def window(self):
+        """(N, L, 3): последние L точек каждого агента, от старой к новой (представление)."""
+        return self.buf[:, self.head - self.maxlen + 1:self.head + 1]
+
+    def path(self, a):
+        """Хвост агента a как непрерывный срез (представление)."""
+        return self.buf[a, self.head - self.length[a] + 1:self.head + 1]
+
+    def clear(self, idx):
+        self.length[idx] = 0
+
+
+class World:
+    """Вся популяция как набор непрерывных массивов: один тик - одна серия векторных операций."""
+
+    def __init__(self, config):
+        self.config = config
+        self.flavor = config['flavor']
+        # Кто этот мир: seed и метка создания; переживает чекпоинты (лежит в config), сверяется архивом
+        config.setdefault('born', time.time_ns())
+        self.identity = {'seed': config['seed'], 'born': config['born']}
+        self.n = n = config['n']
+        self.rng = np.random.default_rng(config['seed'])
+        self.mem = EternalMemory(config)
+
+        self.pos = np.zeros((n, 3))
+        self.role = np.zeros(n, dtype=np.int8)
+        self.energy = np.zeros(n)
+        self.mood = np.zeros(n)
+        self.fear = np.zeros(n)
+        self.color = np.zeros((n, 3))
+        self.s = np.zeros(n)
+        self.r = np.zeros(n)
+        self.b = np.zeros(n)
+        self.coupled = np.zeros(n, dtype=bool)
+        self.index = {}  # Индексы соседей текущего тика по радиусам (cells)
+        self.seek_love = np.zeros(n, dtype=bool)  # Условие тяги к своим (mood), обновляет восприятие
+        self.generation = np.zeros(n, dtype=np.int64)  # Номер жизни агента: растет при каждом перерождении
+        self.last_deaths = None  # Умершие в последнем тике и их состояние в миг смерти (для recorder)
+        self.trails = TrailBuffer(n, config['trail'])
+        if self.flavor == 'neural':
+            self.brain = PopulationMind(n, input_size=10, output_size=5, rng=self.rng)
+
+        self.steps = 0
+        self.metamorphoses = 0
+        self.workers = config.get('workers', 1)
+        self.pool = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+        self.rules = RuleTable(config.get('rules', FLAVORS[self.flavor]['rules']))  # Старые чекпоинты - без таблицы
+        perceive = getattr(self, '_perceive_' + self.flavor, None)
+        self.perceive = None if perceive is None else (config.get('perception', 12.0), perceive)
+        self.reach = self.rules.span(self.perceive)  # Дальности, на которые тик строит индексы соседей
+        self.profiler = TickProfiler(config.get('profile_window', 1000), config.get('profile', False))
+        self.stats = None
+        self.spawn(np.arange(n))
+        self.stats = PopulationStats(self, config.get('stats_window', 1000))
+        self.archive = None
+        if config.get('archive'):
+            self.open_archive(config['archive'])
+
+        self.learner = None
+        if self.flavor == 'neural' and config.get('learning') == 'replay':
+            buffer = ReplayBuffer(n, config['replay'], 10, 5)
+            self.learner = Learner(self.brain, buffer, config['learn_every'], config['learn_batches'],
+                                   threaded=config['learn_thread'], rng=np.random.default_rng(self.rng.integers(2 ** 32)),
+                                   process=config.get('learn_process', False))
+
+    def close(self):
+        """Останавливает фоновые потоки мира (Learner, пул прохода по парам) и дописывает архив."""
+        if self.learner is not None:
+            self.learner.close()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.archive is not None:
+            self.archive.close()
+
+    def open_archive(self, path, resume=False):
+        """Дальше каждая смерть дописывается и в архив на диске (archive.LifeArchive).
+
+        resume=True - продолжить непустой архив этого мира (после чекпоинта; затем archive.truncate):
+        архив сверяет flavor и identity.
+        """
+        if self.archive is not None:
+            self.archive.close()
+        self.config['archive'] = path
+        self.archive = LifeArchive(path, self.flavor, self.config['trail'], resume=resume, world=self.identity)
+
+    def metrics(self):
+        """Сводка мира: смерти, легенды, лучший счет, глобальное настроение и страх (все за O(1))."""
+        stats = self.stats
+        return {
+            'steps': self.steps,
+            'deaths': self.mem.total_deaths,
+            'legendary_lives': self.mem.legendary_lives,
+            'top_score': float(self.mem.top_score),
+            'metamorphoses': self.metamorphoses,
+            'global_mood': stats.mean('mood'),
+            'global_fear': stats.mean('fear'),
+            'avg_energy': stats.mean('energy'),
+            'souls': stats.count(SOUL), 'parasites': stats.count(PARASITE), 'judges': stats.count(JUDGE),
+        }
+
+    def arrays(self):
+        """Копия популяции в виде массивов."""
+        return {'pos': self.pos.copy(), 'role': self.role.copy(), 'energy': self.energy.copy(),
+                'mood': self.mood.copy(), 'fear': self.fear.copy(), 'color': self.color.copy(),
+                'coupled': self.coupled.copy()}
+
+    # --- Рождение ---
+
+    def spawn(self, idx):
+        """Рождение (или перерождение) агентов с индексами idx."""
+        cfg, rng, k = self.config, self.rng, len(idx)
+        if k == 0: return
+        self.pos[idx] = rng.uniform(-cfg['spawn'], cfg['spawn'], (k, 3))
+        self.coupled[idx] = False
+        self.generation[idx] += 1
+        self.fear[idx] = 0.0
+        self.mood[idx] = rng.uniform(-cfg.get('mood', 0.0), cfg.get('mood', 0.0), k)
+        self.s[idx], self.r[idx], self.b[idx] = 10.0, 28.0, 2.666
+
+        dist = cfg['role_dist']
+        u = rng.random(k)
+        role = np.where(u < dist['judge'], JUDGE, np.where(u < dist['judge'] + dist['parasite'], PARASITE, SOUL))
+        if self.stats is not None:
+            self.stats.recount(self.role[idx], role)
+        self.role[idx] = role
+        for code, name in enumerate(ROLES):
+            sel = idx[role == code]
+            if len(sel) == 0 or name not in cfg['birth']: continue
+            birth = cfg['birth'][name]
+            self.energy[sel] = rng.uniform(*birth['energy'], len(sel))
+            if 'color' in birth:
+                self.color[sel] = birth['color']
+            else:
+                self.color[sel] = rng.uniform(*birth.get('tint', (0.0, 1.0)), (len(sel), 3))
+
+        if self.flavor == 'genome':
+            self._inherit(idx)
+        elif self.flavor == 'neural' and self.mem.best_weights:
+            self.brain.set_weights(idx[(role == SOUL) & (rng.random(k) < 0.7)], self.mem.best_weights)
+
+    def _inherit(self, idx):
+        """Universe.py: 70% новорожденных наследуют геном (s, r, b) и цвет старейшей записи.
+
+        config['genome'] = (s, r, b, цвет) - все рождаются с этим геномом (оценка генома в evolve.py).
+        """
+        rng, k = self.rng, len(idx)
+        fixed = self.config.get('genome')
+        if fixed is not None:
+            self.s[idx], self.r[idx], self.b[idx] = fixed[:3]
+            self.color[idx] = fixed[3:6]
+            return
+        self.s[idx], self.r[idx] = rng.uniform(10, 15, k), rng.uniform(20, 35, k)
+        best = self.mem.records[0] if self.mem.records else None
+        if best is None: return
+        heir = idx[rng.random(k) < 0.7]
+        genome = np.asarray(best['g']) + rng.normal(0, 0.05, (len(heir), 3))
+        self.s[heir], self.r[heir], self.b[heir] = genome.T
+        self.color[heir] = best['c']
+
+    # --- Соседи ---
+
+    def cells(self, radius):
+        """Индекс соседей текущего тика с ячейкой radius: строится раз за тик на каждую дальность.
+
+        Своя ячейка на дальность роли: с одной ячейкой под самый большой радиус души с радиусом 6-8
+        перебирали бы в десятки раз больше кандидатов, чем пар.
+        """
+        index = self.index.get(radius)
+        if index is None:
+            index = self.index[radius] = CellList(self.pos, radius, self.role)
+        return index
+
+    # --- Тик ---
+
+    def velocity(self, pos=None):
+        """Базовая физика: аттрактор Лоренца для всей популяции."""
+        return lorenz(self.pos if pos is None else pos, self.s, self.r, self.b)
+
+    def advance(self, force):
+        """Движение: Лоренц + замороженные на тик силы воли, выбранным интегратором.
+
+        substeps > 1 - слитный режим: тик проходит substeps * dt времени за один вызов.
+        """
+        cfg = self.config
+        f = lambda y: self.velocity(y) + force
+        self.pos[:] = integrate(cfg.get('integrator', 'euler'), f, self.pos, cfg['dt'], cfg.get('substeps', 1))
+
+    def step(self):
+        """Один миг жизни для всех агентов сразу.
+
+        Синхронно: проход по парам читает состояние начала фазы и пишет только в буферы изменений
+        (force, d_energy, d_mood, Deltas), которые применяются целиком - порядок агентов не важен.
+        """
+        cfg, n, prof = self.config, self.n, self.profiler
+        self.steps += 1
+        force = np.zeros((n, 3))
+        d_energy = np.zeros(n)
+        d_mood = np.zeros(n)
+        self.coupled[:] = False
+
+        # Индексы соседей строятся один раз за тик; сами пары - частями внутри прохода по правилам
+        with prof.phase('neighbors'):
+            self.index = {}
+            for radius in np.unique(self.reach[self.reach > 0]):
+                self.cells(radius)
+            if 'vision' in cfg:
+                self.trees = RoleTrees(self.pos, self.role, {'soul': (SOUL,), 'threat': (PARASITE, JUDGE)})
+        with prof.phase('forces'):
+            sense = getattr(self, '_sense_' + self.flavor, None)
+            if sense is not None:
+                sense(force, d_energy, d_mood)
+            out = self.rules.apply(self, force, d_energy, d_mood, self.pool, self.perceive)
+        prof.count('interactions', out.pairs)
+
+        with prof.phase('integrate'):
+            self.advance(force)
+            self.trails.append(self.pos)
+
+        self.energy += d_energy
+        self.mood += d_mood
+        self._drain()
+        if self.flavor == 'neural':
+            with prof.phase('learn'):
+                self._learn()
+        self._metamorphose()
+        with prof.phase('reap'):
+            dead = self._reap()
+        with prof.phase('stats'):
+            self.stats.tick(self, len(dead))
+        prof.end_tick(self.steps)
+
+    # --- Восприятие: _sense_* - до таблицы правил, _perceive_* - по частям пар внутри прохода ---
+
+    def _perceive_mood(self, q, pairs):
+        """Восприятие: кто рядом. Вызывается на каждую часть пар - здесь все соседи актеров q."""
+        i, j, vec, dist = pairs
+        rj = self.role[j]
+        near = dist < self.config.get('perception', 12.0)
+        souls = np.bincount(i[near & (rj == SOUL)], minlength=self.n)[q]
+        threats = np.bincount(i[near & (rj != SOUL)], minlength=self.n)[q]
+        self.mood[q] = np.clip(self.mood[q] + souls * 0.01 - threats * 0.02, -1.0, 1.0)
+        self.fear[q] = np.clip(self.fear[q] + threats * 0.05 - souls * 0.01, 0.0, 1.0) * 0.98
+        self.seek_love[q] = (self.role[q] == SOUL) & (self.fear[q] <= 0.5) & (self.mood[q] > 0)
+
+    def _sense_echo(self, force, d_energy, d_mood):
+        n, rng = self.n, self.rng
+
+        # Слух и Шум: глобальное настроение на начало тика (суммы с конца прошлого тика)
+        gm, gf = self.stats.mean('mood'), self.stats.mean('fear')
+        self.mood = np.clip(self.mood + gm * 0.05 + rng.normal(0, 0.02, n), -1.0, 1.0)
+        self.fear = np.clip(self.fear + gf * 0.05, 0.0, 1.0) * 0.95
+        force += rng.normal(0, 0.03, (n, 3))
+
+        # Зрение: ближайшая душа в пределах видимости
+        _, target = self.trees.nearest('soul', self.config['vision'])
+        seen = target >= 0
+        vec_t = self.pos[target[seen]] - self.pos[seen]
+        gain_t = np.where(self.role[seen] == SOUL, 1.2, np.where(self.role[seen] == PARASITE, 1.5, 0.0))
+        force[seen] += vec_t * gain_t[:, None]
+
+    def _sense_neural(self, force, d_energy, d_mood):
+        n, rng = self.n, self.rng
+        gm, gf = self.stats.mean('mood'), self.stats.mean('fear')
+
+        # Ближайшая душа (цель) и ближайшая угроза - один пакетный запрос к деревьям
+        vision = self.config['vision']
+        soul_dist, target = self.trees.nearest('soul', vision)
+        threat_dist, _ = self.trees.nearest('threat', vision)
+        soul_dist[target < 0] = 100.0
+        threat_dist[~np.isfinite(threat_dist)] = 100.0
+        self.threat_dist = threat_dist
+
+        x, y, z = self.pos.T
+        self.inputs = np.stack([x, y, z, self.mood, self.fear, self.energy, threat_dist, soul_dist,
+                                np.full(n, gm), np.full(n, gf)], axis=1)
+        with self.profiler.phase('brain'):
+            decision = self.brain.forward(self.inputs)
+        force += decision[:, 0:3] * 0.4 + rng.normal(0, 0.02, (n, 3))
+        self.flee_gain = decision[:, 4]
+
+        # Души: тяга к цели с силой decision[3]
+        seen = target >= 0
+        seek = seen & (self.role == SOUL)
+        force[seek] += (self.pos[target[seek]] - self.pos[seek]) * decision[seek, 3:4]
+        # Паразиты: охота
+        hunt = seen & (self.role == PARASITE)
+        force[hunt] += (self.pos[target[hunt]] - self.pos[hunt]) * 1.5
+        prey = hunt & (soul_dist < 2.5)
+        self.profiler.count('contacts', prey.sum())
+        d_energy[prey] += 0.25
+        d_mood[prey] += 0.1
+        d_energy -= np.bincount(target[prey], minlength=n) * 0.4
+
+    def _learn(self):
+        """Каждый мозг учится на только что прожитом мгновении - одним пакетом."""
+        target_out = np.zeros((self.n, 5))
+        target_out[self.coupled, 3] = 1.0
+        target_out[self.threat_dist < 10.0, 4] = 1.0
+        if self.learner is None:
+            self.brain.train(self.inputs, target_out)
+            return
+        # Актер только пишет опыт; обучение - в Learner, веса публикуются раз в learn_every тиков
+        self.learner.add(self.inputs, target_out, self.generation)
+        if self.steps % self.learner.every == 0:
+            self.learner.sync(self.generation)
+
+    # --- Энтропия, метаморфоза, смерть ---
+
+    def _drain(self):
+        """Расход энергии за тик: loss[роль], с 'drain' = (a, k) - еще и множитель (a - k * mood)."""
+        cfg, flavor = self.config, FLAVORS.get(self.flavor, {})
+        loss = np.asarray(cfg.get('loss', flavor.get('loss')))[self.role]  # Старые чекпоинты - без loss и drain
+        drain = cfg.get('drain', flavor.get('drain'))
+        if drain is None:
+            self.energy -= loss
+        else:
+            self.energy -= loss * (drain[0] - self.mood * drain[1])
+
+    def _metamorphose(self):
+        """Сломленная душа перерождается в Паразита."""
+        if 'broken' not in self.config: return
+        broken = (self.role == SOUL) & (self.mood < -0.8) & (self.energy < 1.0)
+        if broken.any():
+            self.stats.recount(self.role[broken], np.full(broken.sum(), PARASITE))
+            self.role[broken] = PARASITE
+            self.color[broken] = self.config['broken']
+            self.metamorphoses += int(broken.sum())
+            self.profiler.count('metamorphoses', broken.sum())
+
+    def _reap(self):
+        dead = self.energy <= 0
+        if self.config['bound'] is not None:
+            dead |= np.einsum('ij,ij->i', self.pos, self.pos) > self.config['bound'] ** 2
+        idx = np.flatnonzero(dead)
+        self.profiler.count('deaths', len(idx))
+        for a in idx:
+            weights = self.brain.get_weights(a) if self.flavor == 'neural' else None
+            path = self.trails.path(a)
+            self.mem.save(path, self.color[a].copy(), int(self.role[a]), self.mood[a], self.coupled[a], weights)
+            if self.archive is not None:
+                # В отличие от памяти, архив хранит всех - и короткие следы тоже
+                self.archive.add(self.steps, path, self.color[a], int(self.role[a]), self.mood[a], self.coupled[a],
+                                 self.generation[a], (self.s[a], self.r[a], self.b[a]), weights)
+            if self.flavor == 'genome':
+                self.mem.records.append({'g': [self.s[a], self.r[a], self.b[a]], 'c': self.color[a].copy()})
+        self.last_deaths = {'agent': idx, 'pos': self.pos[idx].copy(), 'color': self.color[idx].copy(),
+                            'role': self.role[idx].copy(), 'mood': self.mood[idx].copy(),
+                            'coupled': self.coupled[idx].copy()}
+        self.trails.clear(idx)
+        self.spawn(idx)
+        return idx
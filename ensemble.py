@@ -0,0 +1,121 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from engine import FLAVORS, make_config
+from headless import run_headless
+
+
+def make_jobs(flavor, ns, role_dists, seeds, ticks, trace_every=100, **overrides):
+    """Декартово произведение параметров: по независимому миру на каждую комбинацию и seed."""
+    jobs = []
+    for n, role_dist, seed in itertools.product(ns, role_dists, seeds):
+        config = make_config(flavor, n=n, seed=seed, role_dist=dict(role_dist), **overrides)
+        jobs.append({'id': len(jobs), 'config': config, 'ticks': ticks, 'trace_every': trace_every})
+    return jobs
+
+
+def run_job(job):
+    """Рабочий процесс: один мир без окна, на выходе - короткая сводка."""
+    trace = []
+    started = time.perf_counter()
+    result = run_headless(job['config'], job['ticks'], job['trace_every'],
+                          lambda world: trace.append((world.steps, float(world.mood.mean()), float(world.fear.mean()))))
+    config = job['config']
+    summary = {'id': job['id'], 'flavor': config['flavor'], 'n': config['n'], 'seed': config['seed'],
+               'judge': config['role_dist']['judge'], 'parasite': config['role_dist']['parasite'],
+               'ticks': job['ticks'], 'seconds': time.perf_counter() - started}
+    summary.update(result['metrics'])
+    summary['mood_trace'] = trace
+    return summary
+
+
+def run_ensemble(jobs, workers=None):
+    """Раздает миры по пулу процессов и отдает сводки по мере готовности (генератор)."""
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def aggregate(rows, keys=('flavor', 'n', 'judge', 'parasite'),
+              metrics=('deaths', 'legendary_lives', 'top_score', 'metamorphoses', 'global_mood', 'global_fear')):
+    """Таблица результатов: среднее и разброс метрик по seed для каждой комбинации параметров."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[k] for k in keys), []).append(row)
+    table = []
+    for key, group in sorted(groups.items()):
+        line = dict(zip(keys, key))
+        line['runs'] = len(group)
+        for m in metrics:
+            values = np.array([g[m] for g in group], dtype=float)
+            values = values[np.isfinite(values)]  # top_score = -inf, пока никто не оставил наследия
+            line[m + '_mean'] = float(values.mean()) if len(values) else float('nan')
+            line[m + '_std'] = float(values.std()) if len(values) else float('nan')
+        table.append(line)
+    return table
+
+
+def write_csv(path, rows):
+    if not rows: return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_traces(path, rows, keys=('id', 'flavor', 'n', 'seed', 'judge', 'parasite')):
+    """Траектории глобального настроения и страха: JSON-строка на прогон, trace - [шаг, mood, fear]."""
+    with open(path, 'w') as f:
+        for row in sorted(rows, key=lambda r: r['id']):
+            line = {k: row[k] for k in keys}
+            line['trace'] = [list(point) for point in row['mood_trace']]
+            f.write(json.dumps(line) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parameter sweep over independent seeded worlds.')
+    parser.add_argument('--flavor', default='mood', choices=sorted(FLAVORS))
+    parser.add_argument('--n', type=int, nargs='+', default=[6, 12, 16])
+    parser.add_argument('--judge', type=float, nargs='+', default=None, help='judge shares (default: flavor)')
+    parser.add_argument('--parasite', type=float, nargs='+', default=None, help='parasite shares (default: flavor)')
+    parser.add_argument('--seeds', type=int, default=4, help='worlds per parameter combination')
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='sweep.csv', help='aggregated results table')
+    parser.add_argument('--runs', default=None, help='optional per-run summaries table')
+    parser.add_argument('--traces', default=None,
+                        help='per-run mood/fear trajectories, JSON lines (default: next to --runs or --out)')
+    args = parser.parse_args()
+
+    default = FLAVORS[args.flavor]['role_dist']
+    judges = args.judge or [default['judge']]
+    parasites = args.parasite or [default['parasite']]
+    role_dists = [{'judge': j, 'parasite': p} for j, p in itertools.product(judges, parasites)]
+    jobs = make_jobs(args.flavor, args.n, role_dists, range(args.seeds), args.ticks)
+    print(f"--- ENSEMBLE: {len(jobs)} worlds on {args.workers or os.cpu_count()} workers ---")
+
+    rows = []
+    for row in run_ensemble(jobs, args.workers):
+        rows.append(row)
+        print(f"[{len(rows)}/{len(jobs)}] n={row['n']} judge={row['judge']} parasite={row['parasite']} "
+              f"seed={row['seed']} | deaths={row['deaths']} mood={row['global_mood']:.2f} ({row['seconds']:.1f}s)")
+
+    write_csv(args.out, aggregate(rows))
+    if args.runs:
+        write_csv(args.runs, [{k: v for k, v in r.items() if k != 'mood_trace'} for r in sorted(rows, key=lambda r: r['id'])])
+    traces = args.traces or os.path.splitext(args.runs or args.out)[0] + '_traces.jsonl'
+    write_traces(traces, rows)
+    print(f"--- Results: {args.out}, traces: {traces} ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from engine import World, make_config
+
+# Допустимые гены (s, r, b). Хаос Лоренца только выше порога Хопфа r_H(s, b) (s=10, b=8/3: ~24.74),
+# поэтому r от 25; остальные гены сдвигают порог - ниже него геном штрафуется (см. evaluate)
+BOUNDS = np.array([[5.0, 20.0], [25.0, 40.0], [1.0, 4.0]])
+
+
+class Archive:
+    """Лучшие K геномов (s, r, b, цвет) по приспособленности - вместо deque из 5 последних смертей."""
+
+    def __init__(self, k=32):
+        self.k = k
+        self.genomes = np.zeros((0, 6))
+        self.fitness = np.zeros(0)
+
+    def __len__(self):
+        return len(self.fitness)
+
+    def offer(self, genomes, fitness):
+        """Пакет оцененных геномов: остаются K лучших."""
+        genomes = np.concatenate([self.genomes, np.asarray(genomes, dtype=float).reshape(-1, 6)])
+        fitness = np.concatenate([self.fitness, np.asarray(fitness, dtype=float)])
+        order = np.argsort(-fitness, kind='stable')[:self.k]
+        self.genomes, self.fitness = genomes[order], fitness[order]
+
+    def best(self):
+        return self.genomes[0], float(self.fitness[0])
+
+    def sample(self, rng, m, sigma=0.3, color_sigma=0.05):
+        """m потомков: родитель - турниром из двух по архиву, ген - с гауссовым шумом."""
+        a, b = rng.integers(len(self), size=(2, m))
+        parents = self.genomes[np.minimum(a, b)]  # Архив отсортирован: меньший индекс - лучше
+        children = parents.copy()
+        children[:, :3] += rng.normal(0, sigma, (m, 3)) * (BOUNDS[:, 1] - BOUNDS[:, 0]) / 10
+        children[:, 3:] += rng.normal(0, color_sigma, (m, 3))
+        return clip(children)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'k': self.k, 'genomes': self.genomes.tolist(), 'fitness': self.fitness.tolist()}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        archive = cls(data['k'])
+        archive.offer(data['genomes'], data['fitness'])
+        return archive
+
+
+def clip(genomes):
+    genomes[:, :3] = np.clip(genomes[:, :3], BOUNDS[:, 0], BOUNDS[:, 1])
+    genomes[:, 3:] = np.clip(genomes[:, 3:], 0.0, 1.0)
+    return genomes
+
+
+def random_genomes(rng, m):
+    """Как новорожденные без наследия в Universe.py (s ~ U(10, 15), b = 2.666), но r ~ U(25, 35) - в хаосе."""
+    return np.column_stack([rng.uniform(10, 15, m), rng.uniform(25, 35, m), np.full(m, 2.666), rng.random((m, 3))])
+
+
+def hopf(s, b):
+    """Порог r_H = s(s + b + 3) / (s - b - 1): выше него неподвижные точки неустойчивы и аттрактор хаотический.
+
+    При s <= b + 1 порога нет - траектория всегда садится в точку.
+    """
+    s, b = np.asarray(s, dtype=float), np.asarray(b, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(s > b + 1, s * (s + b + 3) / (s - b - 1), np.inf)
+
+
+def evaluate(job):
+    """Рабочий процесс: короткие прогоны мира, где все рождаются с одним геномом.
+
+    Приспособленность - средняя доля агентов рядом с "родственной душой" (coupled): именно это
+    Universe.py вознаграждает яркими следами в памяти. Сиды общие для всего поколения.
+    Доля coupled максимальна, когда все сели в одну устойчивую точку, поэтому геном не в хаосе
+    (r <= hopf(s, b)) получает 0 без прогона.
+    """
+    genome, n, ticks, seeds = job
+    if genome[1] <= hopf(genome[0], genome[2]):
+        return 0.0
+    scores = []
+    for seed in seeds:
+        world = World(make_config('genome', n=n, seed=seed, genome=list(genome)))
+        coupled = 0.0
+        for _ in range(ticks):
+            world.step()
+            coupled += world.coupled.mean()
+        world.close()
+        scores.append(coupled / ticks)
+    return float(np.mean(scores))
+
+
+def evolve(generations=20, population=64, k=32, n=6, ticks=300, seeds=3, workers=None, sigma=0.3,
+           seed=None, archive=None, log=print):
+    """Поколения кандидатов, оцененные пакетами на пуле процессов; возвращает архив лучших."""
+    rng = np.random.default_rng(seed)
+    archive = archive if archive is not None else Archive(k)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for g in range(generations):
+            started = time.perf_counter()
+            if len(archive):
+                candidates = archive.sample(rng, population, sigma)
+            else:
+                candidates = random_genomes(rng, population)
+            world_seeds = [int(s) for s in rng.integers(2 ** 31, size=seeds)]
+            jobs = [(genome, n, ticks, world_seeds) for genome in candidates]
+            fitness = list(pool.map(evaluate, jobs, chunksize=max(1, population // (4 * workers))))
+            archive.offer(candidates, fitness)
+            best, score = archive.best()
+            log(f"gen {g:3d}: best {score:.3f} (s={best[0]:.2f}, r={best[1]:.2f}, b={best[2]:.3f}) "
+                f"batch mean {np.mean(fitness):.3f} | {time.perf_counter() - started:.1f}s")
+    return archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evolve Universe.py Lorenz genomes with parallel headless rollouts.')
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--population', type=int, default=64, help='candidates per generation')
+    parser.add_argument('--k', type=int, default=32, help='archive size (best K genomes)')
+    parser.add_argument('--n', type=int, default=6, help='agents per rollout (Universe.py has 6)')
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--seeds', type=int, default=3, help='rollouts per candidate')
+    parser.add_argument('--sigma', type=float, default=0.3, help='mutation scale (tenths of the gene range)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--resume', default=None, help='continue from an archive JSON')
+    parser.add_argument('--out', default='genomes.json')
+    args = parser.parse_args()
+
+    archive = Archive.load(args.resume) if args.resume else None
+    archive = evolve(args.generations, args.population, args.k, args.n, args.ticks, args.seeds, args.workers,
+                     args.sigma, args.seed, archive)
+    archive.save(args.out)
+    best, score = archive.best()
+    print(f"--- Best genome {best[:3].round(3).tolist()} color {best[3:].round(2).tolist()} "
+          f"fitness {score:.3f}; archive: {args.out} ---")
+
+
+if __name__ == "__main__":
+    main()
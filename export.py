@@ -0,0 +1,148 @@
+import argparse
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import matplotlib
+
+# Только Agg: кадры рисуются в файлы, окно не нужно
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from engine import EternalMemory, TrailBuffer
+from recorder import RecordingReader
+from render import VIEWS, Renderer
+
+
+class Replay:
+    """Мир, проигрываемый из записи: те же поля, что читает Renderer.
+
+    Смерти берутся из журнала записи (recorder.DEATHS): точка смерти дописывается к следу, а цвет,
+    роль, настроение и coupled - из мига смерти, так что при every=1 наложения памяти совпадают
+    с живым окном. При every > 1 следы прорежены до записанных тиков, а сами смерти точны.
+    У записей без журнала смерти видны по смене generation - на записанную строку позже.
+    """
+
+    def __init__(self, config, n):
+        self.config, self.flavor, self.n = config, config['flavor'], n
+        self.mem = EternalMemory(config)
+        self.trails = TrailBuffer(n, config['trail'])
+        self.steps = 0
+        self.generation = None
+        self.pos = np.zeros((n, 3))
+        self.role = np.zeros(n, dtype=np.int8)
+        self.color = np.zeros((n, 3))
+        self.mood = np.zeros(n)
+        self.coupled = np.zeros(n, dtype=bool)
+
+    def feed(self, tick, row, deaths=None):
+        """Один записанный тик: row - {колонка: массив (n, ...)}, deaths - смерти после прошлой строки (DEATHS)."""
+        dead = []
+        if deaths is not None:
+            for d in deaths:
+                a = int(d['agent'])
+                path = np.concatenate([self.trails.path(a), d['pos'][None]])
+                self.mem.save(path, d['color'].copy(), int(d['role']), float(d['mood']), bool(d['coupled']))
+                self.trails.clear([a])
+            dead = np.unique(deaths['agent'])
+        elif self.generation is not None:
+            dead = np.flatnonzero(row['generation'] != self.generation)
+            for a in dead:
+                self.mem.save(self.trails.path(a), self.color[a].copy(), int(self.role[a]), self.mood[a],
+                              self.coupled[a])
+            self.trails.clear(dead)
+        self.generation = np.array(row['generation'])
+        self.pos[:], self.role[:], self.color[:] = row['pos'], row['role'], row['color']
+        self.mood[:], self.coupled[:] = row['mood'], row['coupled']
+        self.trails.append(self.pos)
+        if deaths is not None:
+            self.trails.clear(dead)  # Как в мире: хвост новой жизни начинается со следующего тика
+        self.steps = int(tick)
+
+
+def render_frames(path, frames, out, size=(12, 9), dpi=80):
+    """Рабочий процесс: проигрывает запись до последнего своего кадра и рисует кадры frames.
+
+    frames - список (номер кадра, тик). Возвращает число нарисованных кадров.
+    """
+    reader = RecordingReader(path)
+    replay = Replay(reader.config, reader.n)
+    fig = plt.figure(figsize=size, facecolor='black')
+    ax = fig.add_subplot(111, projection='3d')
+    renderer = Renderer(ax, replay, VIEWS[replay.flavor])
+    wanted = dict((tick, number) for number, tick in frames)
+    last = max(wanted)
+    columns = ['pos', 'role', 'color', 'mood', 'coupled', 'generation']
+    deaths = reader.deaths(None, last)
+    drawn = 0
+    for ticks, cols in reader.stream(None, last, columns):
+        for k, tick in enumerate(ticks):
+            if deaths is None:
+                replay.feed(tick, {name: cols[name][k] for name in columns})
+                continue
+            # Журнал отсортирован по тику: смерти (прошлая строка, tick]
+            lo, hi = np.searchsorted(deaths['tick'], [replay.steps, tick], 'right')
+            replay.feed(tick, {name: cols[name][k] for name in columns}, deaths[lo:hi])
+            if tick in wanted:
+                renderer.update()
+                fig.savefig(os.path.join(out, 'frame_%06d.png' % wanted[tick]), dpi=dpi, facecolor='black')
+                drawn += 1
+    plt.close(fig)
+    return drawn
+
+
+def export(path, out, stride=None, workers=None, start=None, stop=None, size=(12, 9), dpi=80):
+    """Рисует кадры записи на пуле процессов: каждому - непрерывный отрезок кадров."""
+    reader = RecordingReader(path)
+    stride = stride or VIEWS[reader.config['flavor']][0]
+    ticks = reader.ticks()
+    if start is not None: ticks = ticks[ticks >= start]
+    if stop is not None: ticks = ticks[ticks <= stop]
+    ticks = ticks[ticks % stride == 0]
+    frames = list(enumerate(int(t) for t in ticks))
+    if not frames: return 0
+    os.makedirs(out, exist_ok=True)
+    workers = min(workers or os.cpu_count(), len(frames))
+    parts = [part.tolist() for part in np.array_split(np.array(frames), workers) if len(part)]
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_frames, path, part, out, size, dpi) for part in parts]
+        for future in as_completed(futures):
+            total += future.result()
+            print(f" > {total}/{len(frames)} frames")
+    return total
+
+
+def make_video(out, video, fps=30):
+    """Склейка кадров в видео через ffmpeg (если он есть); иначе остается последовательность PNG."""
+    if shutil.which('ffmpeg') is None:
+        print(" ! ffmpeg not found: frames left as an image sequence in", out)
+        return False
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', str(fps),
+                    '-i', os.path.join(out, 'frame_%06d.png'), '-pix_fmt', 'yuv420p', video], check=True)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render a recorded run offline (Agg, process pool).')
+    parser.add_argument('recording', help='directory written by recorder.Recorder')
+    parser.add_argument('--out', default='frames')
+    parser.add_argument('--stride', type=int, default=None, help='ticks per frame (default: flavor render stride)')
+    parser.add_argument('--start', type=int, default=None)
+    parser.add_argument('--stop', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=80)
+    parser.add_argument('--video', default=None, help='assemble frames into this video file (needs ffmpeg)')
+    parser.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args()
+
+    total = export(args.recording, args.out, args.stride, args.workers, args.start, args.stop, dpi=args.dpi)
+    print(f"--- {total} frames in {args.out} ---")
+    if args.video and total:
+        make_video(args.out, args.video, args.fps)
+
+
+if __name__ == "__main__":
+    main()
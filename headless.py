@@ -0,0 +1,148 @@
+import argparse
+import contextlib
+import json
+import math
+import signal
+import threading
+
+import checkpoint
+import recorder
+from engine import FLAVORS, World, make_config
+
+
+@contextlib.contextmanager
+def deferred_interrupt():
+    """Ctrl-C во время тика откладывается до его конца (список pending не пуст); второй - прерывает сразу.
+
+    Вне главного потока обработчик сигнала не ставится.
+    """
+    pending = []
+    if threading.current_thread() is not threading.main_thread():
+        yield pending
+        return
+
+    def handler(signum, frame):
+        if pending: raise KeyboardInterrupt
+        pending.append(signum)
+
+    previous = signal.signal(signal.SIGINT, handler)
+    try:
+        yield pending
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def run_headless(config, ticks, every=0, on_report=None, world=None, observers=()):
+    """Мир без окна: строит World из конфигурации и проживает ticks шагов.
+
+    every/on_report - необязательный журнал: on_report(world) раз в every шагов.
+    world - продолжить уже готовый мир (например, из чекпоинта) вместо нового.
+    observers - наблюдатели с maybe(world) каждый тик и close(world) в конце
+    (checkpoint.Checkpointer, recorder.Recorder). close получает мир, только если цикл вышел
+    на границе тика: Ctrl-C ждет конца тика, а исключение изнутри step() оставляет мир
+    недожитым - такой не сохраняется.
+    Возвращает массивы популяции и итоговые метрики.
+    """
+    world = world if world is not None else World(config)
+    whole = True
+    try:
+        with deferred_interrupt() as pending:
+            for _ in range(ticks):
+                whole = False
+                world.step()
+                whole = True
+                if every and on_report and world.steps % every == 0:
+                    on_report(world)
+                for observer in observers:
+                    observer.maybe(world)
+                if pending: raise KeyboardInterrupt
+    finally:
+        world.close()
+        for observer in observers:
+            observer.close(world if whole else None)
+    result = world.arrays()
+    result['metrics'] = world.metrics()
+    return result
+
+
+def jsonable(metrics):
+    """Метрики для JSON: -inf и nan (top_score до первого наследия) становятся null."""
+    return {key: None if isinstance(value, float) and not math.isfinite(value) else value
+            for key, value in metrics.items()}
+
+
+def journal(world):
+    """COSMIC JOURNAL: короткий отчет о состоянии мира."""
+    m = world.metrics()
+    print(f"\n[COSMIC JOURNAL - STEP {m['steps']}]")
+    print(f" > Global Mood: {m['global_mood']:.2f} | Global Fear: {m['global_fear']:.2f}")
+    print(f" > Population: {m['souls']} Souls | {m['parasites'] + m['judges']} Predators/Laws")
+    print(f" > Legacy Score: {m['top_score']:.1f} | Legendary Lives: {m['legendary_lives']}")
+    print(f" > Total Cycle Rebirths: {m['deaths']}")
+    trend = world.stats.summary()
+    print(f" > Trend ({len(world.stats.series['mood'])} ticks): Mood {trend['mood']['mean']:.2f}±{trend['mood']['std']:.2f}"
+          f" | Energy p5/p50/p95 {trend['energy']['p5']:.1f}/{trend['energy']['p50']:.1f}/{trend['energy']['p95']:.1f}"
+          f" | Deaths/tick {trend['deaths']['mean']:.2f}")
+    if world.profiler.enabled:
+        print(world.profiler.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless Universe run (no matplotlib).')
+    parser.add_argument('--flavor', default='mood', choices=sorted(FLAVORS))
+    parser.add_argument('--n', type=int, default=1000)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--judge', type=float, default=None, help='role_dist judge share')
+    parser.add_argument('--parasite', type=float, default=None, help='role_dist parasite share')
+    parser.add_argument('--integrator', default='euler', choices=['euler', 'rk4', 'rk45'])
+    parser.add_argument('--substeps', type=int, default=1, help='fused Lorenz sub-steps per tick')
+    parser.add_argument('--learning', default='online', choices=['online', 'replay'], help='NeuralMind training mode')
+    parser.add_argument('--learn-thread', action='store_true', help='train the replay learner in a thread')
+    parser.add_argument('--learn-process', action='store_true', help='train the replay learner in a separate process')
+    parser.add_argument('--report', type=int, default=0, help='journal every N ticks')
+    parser.add_argument('--checkpoint', default=None, help='write a .npz checkpoint here periodically and on exit/Ctrl-C')
+    parser.add_argument('--checkpoint-every', type=int, default=1000)
+    parser.add_argument('--resume', default=None, help='continue from a .npz checkpoint (config comes from it)')
+    parser.add_argument('--record', default=None, help='record per-tick snapshots into this directory')
+    parser.add_argument('--record-every', type=int, default=1)
+    parser.add_argument('--profile', action='store_true', help='time tick phases; summary goes to the journal')
+    parser.add_argument('--archive', default=None, help='keep every death (path, genome, weights) in this directory')
+    parser.add_argument('--profile-dump', default=None, help='write per-tick phase timings (JSON lines) here')
+    args = parser.parse_args()
+
+    config = make_config(args.flavor, n=args.n, seed=args.seed, integrator=args.integrator, substeps=args.substeps,
+                         learning=args.learning, learn_thread=args.learn_thread, learn_process=args.learn_process,
+                         profile=args.profile or bool(args.profile_dump), archive=args.archive)
+    if args.judge is not None or args.parasite is not None:
+        role_dist = dict(config['role_dist'])
+        if args.judge is not None: role_dist['judge'] = args.judge
+        if args.parasite is not None: role_dist['parasite'] = args.parasite
+        config['role_dist'] = role_dist
+
+    world = checkpoint.load(args.resume) if args.resume else None
+    if world is not None and config['profile']:
+        world.profiler.enabled = True
+    if world is not None and args.archive and args.archive != world.config.get('archive'):
+        # Продолжается только архив из конфигурации чекпоинта (его открыл restore); другой каталог - как новый
+        world.open_archive(args.archive)
+    observers = []
+    if args.checkpoint:
+        observers.append(checkpoint.Checkpointer(args.checkpoint, args.checkpoint_every))
+    if args.record:
+        source = world.config if world is not None else config
+        observers.append(recorder.Recorder(args.record, source['n'], source, every=args.record_every,
+                                           resume=world is not None))
+        if world is not None:
+            observers[-1].truncate(world.steps)
+    world = world if world is not None else World(config)
+    result = run_headless(config, args.ticks, args.report, journal, world, observers)
+    if world.profiler.enabled:
+        print(world.profiler.report())
+        if args.profile_dump:
+            world.profiler.dump(args.profile_dump)
+    print(json.dumps(jsonable(result['metrics']), indent=2, allow_nan=False))
+
+
+if __name__ == "__main__":
+    main()
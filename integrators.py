@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def lorenz(pos, s, r, b):
+    """Скорость аттрактора Лоренца для всей популяции: pos (N, 3), s/r/b (N,)."""
+    x, y, z = pos[:, 0], pos[:, 1], pos[:, 2]
+    return np.stack([s * (y - x), x * (r - z) - y, x * y - b * z], axis=1)
+
+
+def euler(f, y, h):
+    """Явный Эйлер - то, чем считали все варианты Вселенной."""
+    return y + h * f(y)
+
+
+def rk4(f, y, h):
+    """Классический Рунге-Кутта 4-го порядка."""
+    k1 = f(y)
+    k2 = f(y + 0.5 * h * k1)
+    k3 = f(y + 0.5 * h * k2)
+    k4 = f(y + h * k3)
+    return y + h / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+# Таблица Бутчера Дорманда-Принса 5(4)
+_DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_DP_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_DP_E = _DP_B - np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+def rk45(f, y, h, tol=1e-6, max_steps=64):
+    """Адаптивный Дорманд-Принс на отрезке h с общим шагом для всей популяции.
+
+    Шаг дробится, пока худшая по популяции ошибка не станет меньше tol.
+    После max_steps попыток остаток проходится одним шагом rk4.
+    """
+    t, step = 0.0, h
+    for _ in range(max_steps):
+        if t >= h: break
+        step = min(step, h - t)
+        k = []
+        for a in _DP_A:
+            yi = y
+            for coef, kj in zip(a, k):
+                if coef: yi = yi + step * coef * kj
+            k.append(f(yi))
+        k = np.stack(k)
+        y_new = y + step * np.tensordot(_DP_B, k, axes=1)
+        err = np.max(np.abs(step * np.tensordot(_DP_E, k, axes=1)) / (tol + tol * np.abs(y_new)), initial=0.0)
+        if err <= 1.0:
+            t, y = t + step, y_new
+        step *= min(4.0, max(0.2, 0.9 * (1.0 / max(err, 1e-10)) ** 0.2))
+    if t < h:
+        y = rk4(f, y, h - t)  # Лимит шагов исчерпан - добиваем остаток без контроля ошибки
+    return y
+
+
+METHODS = {'euler': euler, 'rk4': rk4, 'rk45': rk45}
+
+
+def integrate(method, f, y, dt, substeps=1):
+    """Слитный режим: substeps подшагов по dt за один вызов, вся популяция сразу."""
+    step = METHODS[method] if isinstance(method, str) else method
+    for _ in range(substeps):
+        y = step(f, y, dt)
+    return y
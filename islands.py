@@ -0,0 +1,229 @@
+import argparse
+import json
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from brain import flatten_weights, unflatten_weights, weight_layout
+from checkpoint import BRAIN_ARRAYS
+from engine import World, make_config
+from headless import jsonable
+
+
+class HallOfFame:
+    """Зал славы в разделяемой памяти: K слотов (счет, легенды, остров, номер записи, веса одним вектором).
+
+    Веса не пиклятся и не ходят по очередям: процессы пишут и читают один и тот же буфер.
+    Замок берется без ожидания - занят, значит обмен переносится на следующий раз.
+    Счет упирается в потолок (след не длиннее maxlen, mood <= 1 - не больше 80), поэтому записи
+    сравниваются по (счет, legendary_lives острова), а при полном равенстве новее - запись с большим номером.
+    """
+
+    def __init__(self, k, lock, name=None):
+        self.k, self.lock = k, lock
+        self.layout = weight_layout()
+        self.size = sum(int(np.prod(shape)) for _, shape in self.layout)
+        nbytes = 8 * k * (4 + self.size)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=nbytes)
+        self.owner = name is None
+        table = np.ndarray((k, 4 + self.size), dtype=np.float64, buffer=self.shm.buf)
+        self.table = table
+        self.score, self.lives, self.island, self.stamp = table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+        self.weights = table[:, 4:]
+        if self.owner:
+            table[:] = 0.0
+            self.score[:] = -np.inf
+            self.island[:] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def pack(self, weights):
+        return flatten_weights(weights, self.layout)
+
+    def unpack(self, flat):
+        return unflatten_weights(flat, self.layout)
+
+    def _order(self, score):
+        """Слоты от лучшего к худшему по (счет, легенды, номер записи)."""
+        return np.lexsort((-self.stamp, -self.lives, -score))
+
+    def publish(self, island, score, lives, weights):
+        """Кладет веса в слот острова или на место худшего, если (score, lives) лучше.
+
+        Возвращает номер записи; None - замок занят или не лучше. Номер меняется, только когда
+        меняются веса: рост одних легенд - не новая запись.
+        """
+        if not self.lock.acquire(block=False): return None
+        try:
+            own = np.flatnonzero(self.island == island)
+            slot = int(own[0]) if len(own) else int(self._order(self.score)[-1])
+            if (score, lives) <= (self.score[slot], self.lives[slot]): return None
+            flat = self.pack(weights)
+            if not (len(own) and np.array_equal(self.weights[slot], flat)):
+                self.weights[slot] = flat
+                self.stamp[slot] = self.stamp.max() + 1
+            self.score[slot], self.lives[slot], self.island[slot] = score, lives, island
+            return int(self.stamp[slot])
+        finally:
+            self.lock.release()
+
+    def best(self, exclude=None):
+        """(счет, легенды, остров, номер, веса) лучшей записи чужого острова или None (и если замок занят)."""
+        if not self.lock.acquire(block=False): return None
+        try:
+            score = np.where(self.island == exclude, -np.inf, self.score)
+            slot = int(self._order(score)[0])
+            if not np.isfinite(score[slot]): return None
+            return (float(score[slot]), int(self.lives[slot]), int(self.island[slot]), int(self.stamp[slot]),
+                    self.unpack(self.weights[slot]))
+        finally:
+            self.lock.release()
+
+    def entries(self):
+        with self.lock:
+            return [(float(self.score[s]), int(self.island[s]), self.unpack(self.weights[s]), int(self.lives[s]))
+                    for s in self._order(self.score) if np.isfinite(self.score[s])]
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class Migration:
+    """Обмен острова с залом славы раз в every тиков; между обменами тик не касается IPC.
+
+    Свой рекорд публикуется, чужой - перенимается, если он выше своего по (top_score, legendary_lives)
+    или равен, но записан в зал позже: лучший мозг острова меняется, и новорожденные души наследуют
+    уже его. Одна и та же запись (остров, номер) перенимается один раз.
+    """
+
+    def __init__(self, hall, island, every=200):
+        self.hall, self.island, self.every = hall, island, every
+        self.published = (-np.inf, 0)
+        self.imported = None
+        self.source = None
+        self.sent = self.received = self.skipped = 0
+
+    def maybe(self, world):
+        if world.steps % self.every: return
+        mem = world.mem
+        key = (mem.top_score, mem.legendary_lives)
+        own = mem.best_weights is not None and mem.best_weights is not self.imported
+        if own and key > self.published:
+            stamp = self.hall.publish(self.island, mem.top_score, mem.legendary_lives, mem.best_weights)
+            if stamp is not None:
+                self.published, self.source = key, (self.island, stamp)
+                self.sent += 1
+            else:
+                self.skipped += 1
+        best = self.hall.best(exclude=self.island)
+        if best is None or best[2:4] == self.source: return
+        newer = self.source is None or best[3] > self.source[1]
+        if best[:2] > key or (best[:2] == key and newer):
+            mem.top_score, _, island, stamp, mem.best_weights = best
+            self.imported, self.source = mem.best_weights, (island, stamp)
+            self.received += 1
+
+    def close(self, world=None):
+        pass
+
+
+def run_island(index, config, ticks, name, lock, k, every, results):
+    """Процесс-остров: свой мир и своя EternalMemory, связь с другими - только через зал славы."""
+    hall = HallOfFame(k, lock, name)
+    world = World(config)
+    migration = Migration(hall, index, every)
+    started = time.perf_counter()
+    try:
+        for _ in range(ticks):
+            world.step()
+            migration.maybe(world)
+    finally:
+        world.close()
+        hall.close()
+    metrics = world.metrics()
+    metrics.update({'island': index, 'seconds': time.perf_counter() - started, 'sent': migration.sent,
+                    'received': migration.received, 'skipped': migration.skipped})
+    results.put(metrics)
+
+
+def run_islands(config, islands=None, ticks=2000, every=200, k=8):
+    """Острова на всех ядрах; возвращает сводки островов и записи зала славы (счет, остров, веса, легенды).
+
+    Остров, упавший без сводки, не подвешивает ожидание: очередь опрашивается с таймаутом,
+    и при ненулевом exitcode у неотчитавшегося процесса остальные останавливаются с RuntimeError.
+    """
+    if config['flavor'] != 'neural':
+        raise ValueError('islands exchange NeuralMind weights: use the neural flavor')
+    islands = islands or mp.cpu_count()
+    lock = mp.Lock()
+    results = mp.Queue()
+    hall = HallOfFame(k, lock)
+    procs = []
+    try:
+        for index in range(islands):
+            seed = None if config['seed'] is None else config['seed'] + index
+            island_config = dict(config, seed=seed)
+            procs.append(mp.Process(target=run_island,
+                                    args=(index, island_config, ticks, hall.name, lock, k, every, results)))
+        for p in procs:
+            p.start()
+        rows = {}
+        while len(rows) < len(procs):
+            try:
+                row = results.get(timeout=1.0)
+                rows[row['island']] = row
+            except queue.Empty:
+                dead = [i for i, p in enumerate(procs) if i not in rows and p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"island(s) {dead} died without a result "
+                                       f"(exit codes {[procs[i].exitcode for i in dead]})")
+        for p in procs:
+            p.join()
+        return [rows[i] for i in sorted(rows)], hall.entries()
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        hall.close()
+
+
+def save_hall(path, entries):
+    """Зал славы в .npz: веса в формате NeuralMind + счета, острова и легенды."""
+    state = {'score': np.array([e[0] for e in entries]), 'island': np.array([e[1] for e in entries]),
+             'lives': np.array([e[3] for e in entries])}
+    for name in BRAIN_ARRAYS:
+        state[name] = np.array([e[2][name] for e in entries])
+    np.savez(path, **state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Island model: neural worlds in processes sharing a hall of fame.')
+    parser.add_argument('--islands', type=int, default=None, help='worlds (default: one per core)')
+    parser.add_argument('--n', type=int, default=200)
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--every', type=int, default=200, help='ticks between migrations')
+    parser.add_argument('--k', type=int, default=8, help='hall of fame size')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', default=None, help='save the hall of fame (.npz)')
+    args = parser.parse_args()
+
+    rows, entries = run_islands(make_config('neural', n=args.n, seed=args.seed), args.islands, args.ticks,
+                                args.every, args.k)
+    for row in rows:
+        print(json.dumps(jsonable({key: row[key] for key in ('island', 'top_score', 'legendary_lives', 'deaths',
+                                                             'sent', 'received', 'skipped', 'seconds')})))
+    print(f"--- Hall of fame: {[(round(s, 1), i, lives) for s, i, _, lives in entries]} ---")
+    if args.out and entries:
+        save_hall(args.out, entries)
+
+
+if __name__ == "__main__":
+    main()
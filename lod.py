@@ -0,0 +1,97 @@
+import numpy as np
+
+# Уровень детализации следов по умолчанию:
+#   budget          - вершин на кадр на все следы (None - без ограничения)
+#   live_share      - доля бюджета, закрепленная за хвостами живых
+#   tolerance       - допуск Дугласа-Пекера для следов памяти (в единицах мира)
+#   faint           - следы прозрачнее этого идут в отдельную бледную коллекцию
+#   faint_tolerance - допуск для бледных следов (их можно прорежать сильнее)
+LOD = {'budget': 20000, 'live_share': 0.5, 'tolerance': 0.25, 'faint': 0.15, 'faint_tolerance': 1.0}
+
+
+def douglas_peucker(path, tolerance):
+    """Индексы точек ломаной (k, 3), которые остаются после упрощения Дугласа-Пекера."""
+    k = len(path)
+    if k < 3 or tolerance <= 0:
+        return np.arange(k)
+    keep = np.zeros(k, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, k - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2: continue
+        seg = path[b] - path[a]
+        rel = path[a + 1:b] - path[a]
+        norm = np.dot(seg, seg)
+        if norm > 0:
+            # Расстояние до отрезка: проекция, зажатая в [0, 1]
+            t = np.clip(rel @ seg / norm, 0.0, 1.0)
+            d = np.linalg.norm(rel - t[:, None] * seg, axis=1)
+        else:
+            d = np.linalg.norm(rel, axis=1)
+        m = int(np.argmax(d))
+        if d[m] > tolerance:
+            mid = a + 1 + m
+            keep[mid] = True
+            stack.append((a, mid))
+            stack.append((mid, b))
+    return np.flatnonzero(keep)
+
+
+def thin(path, stride):
+    """Каждая stride-я точка; последняя (голова или точка смерти) остается всегда."""
+    if stride <= 1 or len(path) < 3:
+        return path
+    if (len(path) - 1) % stride == 0:
+        return path[::stride]
+    return np.concatenate([path[::stride], path[-1:]])
+
+
+def fit(paths, budget):
+    """Прорежает список ломаных одним общим шагом так, чтобы вершин было не больше budget.
+
+    После thin от ломаной остается не больше (k - 1) / stride + 2 точек (начало шага и последняя),
+    то есть не меньше двух: если ломаных больше budget // 2, остается равномерная выборка из
+    budget // 4 (по ~4 точки), а на месте выброшенных - пустые массивы, порядок тот же.
+    """
+    total = sum(len(p) for p in paths)
+    if budget is None or total <= budget or not paths:
+        return paths
+    if 2 * len(paths) > budget:
+        keep = np.zeros(len(paths), dtype=bool)
+        keep[np.linspace(0, len(paths) - 1, budget // 4).astype(int)] = True
+        paths = [p if k else p[:0] for p, k in zip(paths, keep)]
+        total = sum(len(p) for p in paths)
+        if total <= budget:
+            return paths
+    count = sum(1 for p in paths if len(p))
+    stride = int(np.ceil((total - count) / max(budget - 2 * count, 1)))
+    return [thin(p, stride) for p in paths]
+
+
+class MemoryLOD:
+    """Упрощенные следы памяти с кешем по слотам.
+
+    Слот пересчитывается, только когда в него записан новый след (stamp изменился),
+    поэтому смерть стоит одного Дугласа-Пекера, а не перестройки всей памяти.
+    """
+
+    def __init__(self, lod):
+        self.lod = lod
+        self.stamp = np.zeros(0, dtype=np.int64)
+        self.paths = []
+
+    def update(self, m):
+        """m - пакет EternalMemory.batch(). Возвращает (обычные, бледные): списки (путь, слот)."""
+        lod, c = self.lod, len(m['length'])
+        if len(self.stamp) < c:
+            self.stamp = np.concatenate([self.stamp, np.full(c - len(self.stamp), -1, dtype=np.int64)])
+            self.paths += [None] * (c - len(self.paths))
+        faint = m['alpha'] < lod['faint']
+        for k in np.flatnonzero(self.stamp[:c] != m['stamp']):
+            path = m['trails'][k, :m['length'][k]]
+            tolerance = lod['faint_tolerance'] if faint[k] else lod['tolerance']
+            self.paths[k] = path[douglas_peucker(path, tolerance)].copy()
+            self.stamp[k] = m['stamp'][k]
+        slots = np.arange(c)
+        return slots[~faint], slots[faint]
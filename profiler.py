@@ -0,0 +1,106 @@
+import json
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+
+class _Null:
+    """Пустая фаза: профайлер выключен - цена вызова почти нулевая."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+class _Phase:
+    """Замер фазы. Вложенные фазы не считаются дважды: родителю идет только собственное время."""
+    __slots__ = ('profiler', 'name', 'start', 'inner')
+
+    def __init__(self, profiler, name):
+        self.profiler, self.name, self.inner = profiler, name, 0.0
+
+    def __enter__(self):
+        self.profiler.stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler.stack
+        stack.pop()
+        self.profiler.times[self.name] += elapsed - self.inner
+        if stack:
+            stack[-1].inner += elapsed
+        return False
+
+
+class TickProfiler:
+    """Время по фазам тика и счетчики событий, со скользящим окном последних тиков.
+
+    Включается и выключается на лету (enabled); выключенный стоит одну проверку на фазу.
+    """
+
+    def __init__(self, window=1000, enabled=False):
+        self.enabled = enabled
+        self.window = deque(maxlen=window)
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.stack = []
+
+    def phase(self, name):
+        return _Phase(self, name) if self.enabled else _NULL
+
+    def count(self, name, k=1):
+        if self.enabled:
+            self.counts[name] += int(k)
+
+    def end_tick(self, step):
+        """Закрывает тик: его фазы и счетчики уходят в окно."""
+        if not self.enabled: return
+        self.window.append({'step': step, 'times': dict(self.times), 'counts': dict(self.counts)})
+        self.times.clear()
+        self.counts.clear()
+
+    def summary(self):
+        """Сводка по окну: среднее и p95 каждой фазы (мс), доля в тике, счетчики на тик и всего."""
+        ticks = list(self.window)
+        phases, counters = {}, {}
+        if not ticks:
+            return {'ticks': 0, 'phases': phases, 'counters': counters}
+        names = sorted({name for t in ticks for name in t['times']})
+        total = sum(sum(t['times'].values()) for t in ticks) or 1.0
+        for name in names:
+            values = np.array([t['times'].get(name, 0.0) for t in ticks]) * 1000.0
+            phases[name] = {'mean_ms': float(values.mean()), 'p95_ms': float(np.percentile(values, 95)),
+                            'share': float(values.sum() / 1000.0 / total)}
+        for name in sorted({name for t in ticks for name in t['counts']}):
+            values = np.array([t['counts'].get(name, 0) for t in ticks])
+            counters[name] = {'per_tick': float(values.mean()), 'total': int(values.sum())}
+        return {'ticks': len(ticks), 'first': ticks[0]['step'], 'last': ticks[-1]['step'],
+                'phases': phases, 'counters': counters}
+
+    def report(self):
+        """Строки для Cosmic Journal."""
+        s = self.summary()
+        if not s['ticks']:
+            return " > Profiler: no data"
+        lines = [f" > Profiler (last {s['ticks']} ticks):"]
+        for name, p in sorted(s['phases'].items(), key=lambda item: -item[1]['share']):
+            lines.append(f"   {name:10s} {p['mean_ms']:8.3f} ms  p95 {p['p95_ms']:8.3f} ms  {p['share'] * 100:5.1f}%")
+        counters = ', '.join(f"{name} {c['per_tick']:.1f}/tick" for name, c in s['counters'].items())
+        if counters:
+            lines.append(f"   {counters}")
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        """Структурированный дамп окна: по JSON-строке на тик + сводка в конце."""
+        with open(path, 'w') as f:
+            for tick in self.window:
+                f.write(json.dumps(tick) + '\n')
+            f.write(json.dumps({'summary': self.summary()}) + '\n')
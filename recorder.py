@@ -0,0 +1,201 @@
+import json
+import os
+
+import numpy as np
+
+# Колонки снимка популяции: имя -> (dtype, форма на агента)
+COLUMNS = {
+    'pos': ('<f4', (3,)),
+    'role': ('i1', ()),
+    'energy': ('<f4', ()),
+    'mood': ('<f4', ()),
+    'fear': ('<f4', ()),
+    'color': ('<f4', (3,)),
+    'coupled': ('?', ()),
+    'generation': ('<i4', ()),
+}
+# Журнал смертей: по строке на смерть, с состоянием агента в миг смерти (до перерождения)
+DEATHS = np.dtype([('tick', '<i8'), ('agent', '<i4'), ('pos', '<f4', (3,)), ('color', '<f4', (3,)),
+                   ('role', 'i1'), ('mood', '<f4'), ('coupled', '?')])
+
+
+class Recorder:
+    """Дописываемая запись траекторий: по снимку популяции на тик, в колоночные memmap-чанки.
+
+    Каталог записи:
+      meta.json           - n, колонки, размер чанка, конфигурация и индекс чанков [первый тик, последний, строк]
+      chunk_00000/<col>   - сырые массивы (chunk, n, ...) каждой колонки + ticks (chunk,)
+      deaths              - журнал смертей DEATHS за каждый тик, даже при every > 1; в meta - число строк
+    В памяти только текущий чанк (страницы memmap), запись тика - несколько memcpy.
+    Непустая запись продолжается только с resume=True (тот же мир с чекпоинта: n и flavor сверяются,
+    размер чанка берется из записи), затем truncate(тик чекпоинта); дописывается с нового чанка.
+    """
+
+    def __init__(self, path, n, config=None, chunk=1024, every=1, resume=False):
+        self.path, self.n, self.chunk, self.every = path, n, chunk, every
+        os.makedirs(path, exist_ok=True)
+        self.meta = None
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['chunks']:
+                if not resume:
+                    raise FileExistsError(f"{path} already holds a recording of ticks {meta['chunks'][0][0]}.."
+                                          f"{meta['chunks'][-1][1]}; resume it or use an empty directory")
+                flavor = lambda c: (c or {}).get('flavor')
+                if meta['n'] != n or flavor(meta['config']) != flavor(config):
+                    raise ValueError(f"{path} records {meta['n']} {flavor(meta['config'])!r} agents, "
+                                     f"not {n} {flavor(config)!r}")
+                self.meta, self.chunk = meta, meta['chunk']
+        if self.meta is None:
+            self.meta = {'n': n, 'chunk': chunk, 'every': every, 'config': config,
+                         'columns': {name: [dtype, list(shape)] for name, (dtype, shape) in COLUMNS.items()},
+                         'chunks': [], 'deaths': 0}
+        self.maps = None
+        self.rows = 0
+        self.deaths = self.meta.get('deaths', 0)
+        self._write_meta()
+        deaths = os.path.join(path, 'deaths')
+        with open(deaths, 'ab') as f:
+            f.truncate(self.meta.get('deaths', 0) * DEATHS.itemsize)  # Хвост после падения не в индексе
+        self.log = open(deaths, 'ab')
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+    def _open_chunk(self):
+        folder = os.path.join(self.path, 'chunk_%05d' % len(self.meta['chunks']))
+        os.makedirs(folder, exist_ok=True)
+        self.maps = {'ticks': np.memmap(os.path.join(folder, 'ticks'), '<i8', 'w+', shape=(self.chunk,))}
+        for name, (dtype, shape) in COLUMNS.items():
+            self.maps[name] = np.memmap(os.path.join(folder, name), dtype, 'w+', shape=(self.chunk, self.n) + shape)
+        self.rows = 0
+
+    def _close_chunk(self):
+        if self.maps is None: return
+        for m in self.maps.values():
+            m.flush()
+        ticks = self.maps['ticks']
+        if self.rows:
+            self.log.flush()
+            self.meta['chunks'].append([int(ticks[0]), int(ticks[self.rows - 1]), self.rows])
+            self.meta['deaths'] = self.deaths
+            self._write_meta()
+        self.maps = None
+
+    def truncate(self, tick):
+        """Забывает тики после tick (продолжение с чекпоинта не дублирует и не перемешивает тиков)."""
+        self._close_chunk()
+        chunks = self.meta['chunks']
+        while chunks and chunks[-1][0] > tick:
+            chunks.pop()
+        if chunks and chunks[-1][1] > tick:
+            c = len(chunks) - 1
+            ticks = np.memmap(os.path.join(self.path, 'chunk_%05d' % c, 'ticks'), '<i8', 'r', shape=(self.chunk,))
+            keep = int(np.searchsorted(ticks[:chunks[c][2]], tick, 'right'))
+            chunks[c] = [chunks[c][0], int(ticks[keep - 1]), keep]
+        self.log.flush()
+        log = np.fromfile(os.path.join(self.path, 'deaths'), DEATHS, self.deaths)
+        self.deaths = self.meta['deaths'] = int(np.searchsorted(log['tick'], tick, 'right'))
+        self.log.truncate(self.deaths * DEATHS.itemsize)
+        self._write_meta()
+
+    def record(self, world):
+        """Снимок популяции текущего тика."""
+        if self.maps is None:
+            self._open_chunk()
+        row = self.rows
+        self.maps['ticks'][row] = world.steps
+        for name in COLUMNS:
+            self.maps[name][row] = getattr(world, name)
+        self.rows += 1
+        if self.rows == self.chunk:
+            self._close_chunk()
+
+    def obituary(self, world):
+        """Смерти этого тика - в журнал (world.last_deaths: состояние до перерождения)."""
+        dead = world.last_deaths
+        if dead is None or not len(dead['agent']): return
+        rows = np.zeros(len(dead['agent']), DEATHS)
+        rows['tick'] = world.steps
+        for name in DEATHS.names[1:]:
+            rows[name] = dead[name]
+        self.log.write(rows.tobytes())
+        self.deaths += len(rows)
+
+    def maybe(self, world):
+        self.obituary(world)
+        if world.steps % self.every == 0:
+            self.record(world)
+
+    def close(self, world=None):
+        self._close_chunk()
+        self.meta['deaths'] = self.deaths
+        self._write_meta()
+        self.log.close()
+
+
+class RecordingReader:
+    """Чтение записи без загрузки целиком: поток по диапазону тиков или произвольный доступ к тику."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.n = self.meta['n']
+        self.config = self.meta['config']
+        chunks = np.array(self.meta['chunks'], dtype=np.int64).reshape(-1, 3)
+        self.first, self.last, self.rows = chunks[:, 0], chunks[:, 1], chunks[:, 2]
+
+    def __len__(self):
+        return int(self.rows.sum())
+
+    def ticks(self):
+        """Все записанные тики."""
+        parts = [self._column(c, 'ticks') for c in range(len(self.rows))]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _column(self, c, name):
+        path = os.path.join(self.path, 'chunk_%05d' % c, name)
+        if name == 'ticks':
+            m = np.memmap(path, '<i8', 'r', shape=(self.meta['chunk'],))
+        else:
+            dtype, shape = self.meta['columns'][name]
+            m = np.memmap(path, dtype, 'r', shape=(self.meta['chunk'], self.n) + tuple(shape))
+        return m[:self.rows[c]]
+
+    def deaths(self, start=None, stop=None):
+        """Журнал смертей (массив DEATHS) с тиками в [start, stop]; у старых записей журнала нет - None."""
+        path = os.path.join(self.path, 'deaths')
+        if 'deaths' not in self.meta or not os.path.exists(path): return None
+        log = np.fromfile(path, DEATHS, self.meta['deaths'])
+        lo = 0 if start is None else int(np.searchsorted(log['tick'], start, 'left'))
+        hi = len(log) if stop is None else int(np.searchsorted(log['tick'], stop, 'right'))
+        return log[lo:hi]
+
+    def stream(self, start=None, stop=None, columns=None):
+        """Генератор (ticks, {колонка: массив}) по чанкам для тиков в [start, stop]; массивы - memmap-представления."""
+        columns = columns or list(self.meta['columns'])
+        for c in range(len(self.rows)):
+            if stop is not None and self.first[c] > stop: break
+            if start is not None and self.last[c] < start: continue
+            ticks = self._column(c, 'ticks')
+            lo = 0 if start is None else int(np.searchsorted(ticks, start, 'left'))
+            hi = len(ticks) if stop is None else int(np.searchsorted(ticks, stop, 'right'))
+            if lo < hi:
+                yield ticks[lo:hi], {name: self._column(c, name)[lo:hi] for name in columns}
+
+    def at(self, tick, columns=None):
+        """Снимок ближайшего записанного тика не позже tick: {колонка: массив (n, ...)}."""
+        c = int(np.searchsorted(self.first, tick, 'right')) - 1
+        if c < 0: raise KeyError(tick)
+        ticks = self._column(c, 'ticks')
+        row = max(0, int(np.searchsorted(ticks, tick, 'right')) - 1)
+        columns = columns or list(self.meta['columns'])
+        snap = {name: np.array(self._column(c, name)[row]) for name in columns}
+        snap['tick'] = int(ticks[row])
+        return snap
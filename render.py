@@ -0,0 +1,108 @@
+import numpy as np
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from engine import JUDGE, PARASITE, SOUL
+from lod import LOD, MemoryLOD, fit
+
+# Камера и частота рендера каждого варианта: (шаг рендера, xy-предел, z-предел, наклон, скорость вращения)
+VIEWS = {
+    'genome': (20, 30, 50, 25, 0.15),
+    'roles': (5, 40, 60, 20, 0.2),
+    'mood': (6, 50, 70, 20, 0.1),
+    'echo': (6, 60, 80, 25, 0.1),
+    'neural': (8, 70, 90, 20, 0.1),
+}
+
+
+class Renderer:
+    """Художники создаются один раз; каждый кадр меняются только вершины и цвета.
+
+    - dead: Line3DCollection со следами EternalMemory (перестраивается только при save/вытеснении)
+    - faint: бледные следы памяти одной коллекцией, прорежены сильнее
+    - live: Line3DCollection с хвостами живых душ и судей, hunters - пунктир паразитов
+      (у каждой коллекции один стиль линии: пошаговые стили matplotlib размножает на все сегменты)
+    - heads: один scatter для голов (судьи и души)
+
+    lod - замены к lod.LOD: следы памяти упрощаются, а вершин за кадр не больше бюджета.
+    """
+
+    def __init__(self, ax, world, view, lod=None):
+        self.ax, self.world = ax, world
+        self.lod = dict(LOD, **(lod or {}))
+        self.memory_lod = MemoryLOD(self.lod)
+        budget = self.lod['budget']
+        self.live_budget = None if budget is None else int(budget * self.lod['live_share'])
+        self.dead_budget = None if budget is None else budget - self.live_budget
+        self.vertices = 0
+        _, lim, zlim, self.elev, self.spin = view
+        ax.set_facecolor('black')
+        ax.set_axis_off()
+        ax.set_xlim(-lim, lim)
+        ax.set_ylim(-lim, lim)
+        ax.set_zlim(0, zlim)
+
+        # Пустая невидимая заготовка: add_collection3d требует хотя бы один сегмент
+        blank = [np.zeros((2, 3))]
+        self.dead = Line3DCollection(blank, colors=[(0, 0, 0, 0)])
+        self.faint = Line3DCollection(blank, colors=[(0, 0, 0, 0)])
+        self.live = Line3DCollection(blank, colors=[(0, 0, 0, 0)])
+        self.hunters = Line3DCollection(blank, colors=[(0, 0, 0, 0)], linestyles=':', linewidths=1.0)
+        ax.add_collection3d(self.faint)
+        ax.add_collection3d(self.dead)
+        ax.add_collection3d(self.live)
+        ax.add_collection3d(self.hunters)
+        self.heads = ax.scatter([], [], [], s=[], depthshade=False, edgecolors='white', linewidths=0.5)
+        self.title = ax.text2D(0.05, 0.95, '', transform=ax.transAxes, color='white', fontsize=10)
+        self.memory_version = -1
+        self.dead_vertices = 0
+
+    def update_memory(self):
+        """Прошлое: упрощенные следы ушедших, в пределах своей части бюджета вершин."""
+        m = self.world.mem.batch()
+        normal, faint = self.memory_lod.update(m)
+        paths = fit([self.memory_lod.paths[k] for k in normal] + [self.memory_lod.paths[k] for k in faint],
+                    self.dead_budget)
+        rgba = np.empty((len(m['length']), 4))
+        rgba[:, :3], rgba[:, 3] = m['color'], m['alpha']
+        for collection, slots, part in ((self.dead, normal, paths[:len(normal)]),
+                                        (self.faint, faint, paths[len(normal):])):
+            collection.set_segments(part)
+            collection.set_color(rgba[slots])
+            collection.set_linewidths(m['lw'][slots])
+        self.dead_vertices = sum(len(p) for p in paths)
+        self.memory_version = self.world.mem.version
+
+    def update(self):
+        """Один кадр: обновляет данные художников, не создавая новых."""
+        world = self.world
+        if world.mem.version != self.memory_version:
+            self.update_memory()
+
+        # Настоящее: хвосты живых
+        alive = np.flatnonzero(world.trails.length > 1)
+        role = world.role[alive]
+        # Копии: коллекция держит массивы до следующего кадра, а окно хвостов (в том числе снимка,
+        # отданного обратно SnapshotExchange) к тому времени уже переписано - перерисовка при
+        # вращении мышью или resize рисовала бы чужие точки
+        live = [np.array(p) for p in fit([world.trails.path(a) for a in alive], self.live_budget)]
+        self.vertices = self.dead_vertices + sum(len(p) for p in live)
+        rgba = np.ones((len(alive), 4))
+        rgba[:, :3] = world.color[alive]
+        rgba[role == JUDGE, :3] = 1.0
+        rgba[:, 3] = np.where(role == PARASITE, 0.7, 0.9)
+        hunt = role == PARASITE
+        self.live.set_segments([p for p, h in zip(live, hunt) if not h])
+        self.live.set_color(rgba[~hunt])
+        self.live.set_linewidths(np.where(role[~hunt] == JUDGE, 2.0, np.where(world.coupled[alive[~hunt]], 2.5, 1.2)))
+        self.hunters.set_segments([p for p, h in zip(live, hunt) if h])
+        self.hunters.set_color(rgba[hunt])
+
+        # Головы: звезды судей и души, размер по настроению
+        heads = world.pos[alive]
+        sizes = np.where(role == JUDGE, 80.0, np.where(role == SOUL, np.clip(20 + world.mood[alive] * 40, 5, 80), 0.0))
+        self.heads._offsets3d = (heads[:, 0], heads[:, 1], heads[:, 2])
+        self.heads.set_sizes(sizes)
+        self.heads.set_facecolor(rgba[:, :3] if len(alive) else 'white')
+
+        self.title.set_text(f"{world.flavor.upper()} | Steps: {world.steps} | Souls: {int((world.role == SOUL).sum())}")
+        self.ax.view_init(self.elev, world.steps * self.spin)
@@ -0,0 +1,155 @@
+import threading
+import time
+
+import numpy as np
+
+# Поля популяции, которые копируются в снимок
+FIELDS = ('pos', 'role', 'color', 'coupled', 'mood', 'fear', 'energy', 'generation')
+MEMORY_FIELDS = ('trails', 'length', 'color', 'alpha', 'lw', 'role', 'stamp')
+
+
+class TrailView:
+    """Хвосты живых в снимке: окно (N, L, 3) от старой точки к новой, как TrailBuffer.window()."""
+
+    def __init__(self, n, maxlen):
+        self.maxlen = maxlen
+        self.win = np.zeros((n, maxlen, 3))
+        self.length = np.zeros(n, dtype=np.int32)
+
+    def window(self):
+        return self.win
+
+    def path(self, a):
+        return self.win[a, self.maxlen - self.length[a]:]
+
+
+class MemoryView:
+    """Копия EternalMemory в снимке: переписывается, только когда память изменилась (version)."""
+
+    def __init__(self, mem):
+        self.arrays = {name: np.zeros_like(getattr(mem, name)) for name in MEMORY_FIELDS}
+        self.count = 0
+        self.version = -1
+
+    def batch(self):
+        # Копии, а не представления: художник держит их и после того, как снимок вернулся писателю
+        return {name: a[:self.count].copy() for name, a in self.arrays.items()}
+
+
+class Snapshot:
+    """Неизменяемый кадр мира: те же поля, что читает Renderer, но свои копии.
+
+    Пока снимок выдан читателю, его массивы только для чтения, а писатель его не трогает.
+    """
+
+    def __init__(self, world):
+        self.flavor, self.n, self.config = world.flavor, world.n, world.config
+        self.steps = -1
+        self.metrics = {}
+        for name in FIELDS:
+            setattr(self, name, np.zeros_like(getattr(world, name)))
+        self.trails = TrailView(world.n, world.trails.maxlen)
+        self.mem = MemoryView(world.mem)
+
+    def _arrays(self):
+        return [getattr(self, name) for name in FIELDS] + [self.trails.win, self.trails.length] + \
+            list(self.mem.arrays.values())
+
+    def fill(self, world):
+        """Копирует мир в этот буфер (вызывается писателем, когда буфер свободен)."""
+        for a in self._arrays():
+            a.flags.writeable = True
+        for name in FIELDS:
+            getattr(self, name)[...] = getattr(world, name)
+        self.trails.win[...] = world.trails.window()
+        self.trails.length[...] = world.trails.length
+        mem = world.mem
+        if self.mem.version != mem.version:
+            c = self.mem.count = len(mem)
+            for name, a in self.mem.arrays.items():
+                a[:c] = getattr(mem, name)[:c]
+            self.mem.version = mem.version
+        self.steps = world.steps
+        self.metrics = world.metrics()
+        for a in self._arrays():
+            a.flags.writeable = False
+
+
+class SnapshotExchange:
+    """Двойной буфер снимков между потоком симуляции и читателем.
+
+    front - последний опубликованный снимок, back - тот, в который пишет симуляция.
+    Публикация - копия в back и обмен ссылок под коротким замком. Если читатель все еще держит
+    back (взял его до обмена), публикация пропускается: ни одна сторона не ждет другую.
+    """
+
+    def __init__(self, world):
+        self.lock = threading.Lock()
+        self.front, self.back = Snapshot(world), Snapshot(world)
+        self.busy = None
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, world):
+        with self.lock:
+            if self.busy is self.back:
+                self.dropped += 1
+                return False
+            back = self.back
+        back.fill(world)
+        with self.lock:
+            self.front, self.back = back, self.front
+            self.published += 1
+        return True
+
+    def acquire(self):
+        """Последний снимок для читателя (или None, пока публикаций не было); вернуть через release."""
+        with self.lock:
+            if self.front.steps < 0: return None
+            self.busy = self.front
+            return self.front
+
+    def release(self, snapshot):
+        with self.lock:
+            if self.busy is snapshot:
+                self.busy = None
+
+
+class SimulationThread(threading.Thread):
+    """Симуляция в своем потоке на полной скорости: шаги мира и публикация снимков.
+
+    Снимок публикуется не чаще раза в interval секунд - копирование не съедает скорость шагов.
+    on_step(world) - необязательный вызов после каждого шага (журнал и т.п.).
+    """
+
+    def __init__(self, world, exchange, interval=1 / 60, on_step=None):
+        super().__init__(daemon=True)
+        self.world, self.exchange, self.interval, self.on_step = world, exchange, interval, on_step
+        self.stopping = threading.Event()
+        self.error = None
+        self.rate = 0.0
+
+    def run(self):
+        world, exchange = self.world, self.exchange
+        last = 0.0
+        started, ticks = time.perf_counter(), 0
+        try:
+            exchange.publish(world)
+            while not self.stopping.is_set():
+                world.step()
+                ticks += 1
+                if self.on_step is not None:
+                    self.on_step(world)
+                now = time.perf_counter()
+                if now - last >= self.interval:
+                    exchange.publish(world)
+                    last = now
+                    self.rate = ticks / (now - started)
+        except Exception as error:
+            self.error = error
+            raise
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        self.world.close()
@@ -0,0 +1,162 @@
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Кандидатов в пары на одну часть прохода (CellList.blocks): ~1M пар - десятки мегабайт
+BLOCK = 1 << 20
+
+
+class CellList:
+    """Равномерная сетка (cell list): соседи ищутся только в ближайших ячейках, а не среди всех N."""
+
+    def __init__(self, pos, cell, role=None):
+        self.pos = pos
+        self.cell = float(cell)
+        self.role = role
+        self.n = len(pos)
+        coords = np.floor(pos / self.cell).astype(np.int64)
+        self.origin = coords.min(axis=0) - 1 if self.n else np.zeros(3, dtype=np.int64)
+        self.dims = (coords.max(axis=0) - self.origin + 2) if self.n else np.ones(3, dtype=np.int64)
+        self.coords = coords - self.origin
+        # Разреженный индекс: агенты отсортированы по ключу ячейки, пустые ячейки не хранятся
+        self.keys = self._key(self.coords)
+        self.order = np.argsort(self.keys, kind='stable')
+        self.sorted_keys = self.keys[self.order]
+        # Занятые ячейки: соседние ячейки ищутся для каждой занятой ячейки, а не для каждого агента
+        first = np.r_[True, self.sorted_keys[1:] != self.sorted_keys[:-1]] if self.n else np.zeros(0, dtype=bool)
+        self.occupied = self.coords[self.order[first]]
+        self.cell_of = np.empty(self.n, dtype=np.int64)
+        self.cell_of[self.order] = np.cumsum(first) - 1
+        self.around = {}
+
+    def _key(self, coords):
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    def _cells(self, coords, radius):
+        """Ячейки вокруг coords: начало агентов каждой ячейки в order и их число, форма (точки, смещения)."""
+        reach = int(np.ceil(radius / self.cell))
+        span = np.arange(-reach, reach + 1)
+        offsets = np.stack(np.meshgrid(span, span, span, indexing='ij'), axis=-1).reshape(-1, 3)
+        around = coords[:, None, :] + offsets[None, :, :]
+        inside = np.all((around >= 0) & (around < self.dims), axis=-1)
+        keys = np.where(inside, self._key(around), -1)
+        lo = np.searchsorted(self.sorted_keys, keys, 'left')
+        hi = np.searchsorted(self.sorted_keys, keys, 'right')
+        return lo, np.where(inside, hi - lo, 0)
+
+    def _agent_cells(self, query, radius):
+        """_cells для агентов query: через занятые ячейки, один раз на радиус."""
+        if radius not in self.around:
+            self.around[radius] = self._cells(self.occupied, radius)
+        lo, count = self.around[radius]
+        c = self.cell_of[query]
+        return lo[c], count[c]
+
+    def _candidates(self, lo, count):
+        """Все агенты в ячейках (lo, count) из _cells: (индекс запроса, индекс агента)."""
+        count = count.ravel()
+        total = int(count.sum())
+        qi = np.repeat(np.repeat(np.arange(len(lo)), lo.shape[1]), count)
+        start = np.repeat(lo.ravel(), count)
+        step = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+        return qi, self.order[start + step]
+
+    def blocks(self, query, radius, budget=None):
+        """Делит агентов query на части по ~budget кандидатов в пары (агент целиком в одной части).
+
+        На аттракторе почти все агенты в соседних ячейках: все пары сразу не влезают в память.
+        """
+        budget = budget or BLOCK
+        if len(query) == 0:
+            return []
+        load = np.cumsum(self._agent_cells(query, radius)[1].sum(axis=1))
+        cuts = np.searchsorted(load, np.arange(budget, load[-1], budget), 'left') + 1
+        return [q for q in np.split(query, np.unique(cuts)) if len(q)]
+
+    def pairs(self, radius, actors=None, targets=None, query=None):
+        """Все упорядоченные пары (i, j), i != j, ближе radius: (i, j, vec, dist), vec = pos[j] - pos[i].
+
+        actors/targets - необязательные наборы кодов ролей для i и j;
+        query - только эти агенты в роли i (часть из blocks).
+        """
+        pos = self.pos
+        query = np.arange(self.n) if query is None else query
+        qi, j = self._candidates(*self._agent_cells(query, radius))
+        i = query[qi]
+        vec = pos[j] - pos[i]
+        d2 = np.einsum('ij,ij->i', vec, vec)
+        # Один отбор вместо двух: кандидатов в разы больше, чем пар
+        near = (d2 < radius * radius) & (i != j)
+        if actors is not None: near &= np.isin(self.role[i], actors)
+        if targets is not None: near &= np.isin(self.role[j], targets)
+        return i[near], j[near], vec[near], np.sqrt(d2[near])
+
+    def within(self, point, radius, roles=None):
+        """Индексы агентов в радиусе radius от точки, с фильтром по ролям."""
+        coords = np.floor(np.asarray(point, dtype=float) / self.cell).astype(np.int64)[None, :] - self.origin
+        _, j = self._candidates(*self._cells(coords, radius))
+        if roles is not None: j = j[np.isin(self.role[j], roles)]
+        d = np.linalg.norm(self.pos[j] - point, axis=1)
+        return j[d < radius]
+
+
+class RoleTrees:
+    """KD-дерево на каждую группу ролей: ближайший представитель группы для всех агентов одним запросом.
+
+    Для больших радиусов (зрение 35-40) сетка почти ничего не отсекает, дерево - отсекает.
+    """
+
+    def __init__(self, pos, role, groups):
+        self.pos = pos
+        self.role = role
+        self.members = {}
+        self.trees = {}
+        for name, codes in groups.items():
+            members = np.flatnonzero(np.isin(role, codes))
+            self.members[name] = members
+            if cKDTree is not None and len(members):
+                self.trees[name] = cKDTree(pos[members])
+
+    def nearest(self, group, radius):
+        """(dist, idx) ближайшего агента группы для каждого агента, не считая его самого.
+
+        Если в радиусе никого нет: dist = inf, idx = -1.
+        """
+        n, members = len(self.pos), self.members[group]
+        dist, idx = np.full(n, np.inf), np.full(n, -1)
+        if len(members) == 0:
+            return dist, idx
+        if group not in self.trees:
+            return self._nearest_cells(members, radius)
+        k = min(2, len(members))
+        d, m = self.trees[group].query(self.pos, k=k, distance_upper_bound=radius)
+        d, m = d.reshape(n, k), m.reshape(n, k)
+        found = m < len(members)
+        cand = np.where(found, members[np.minimum(m, len(members) - 1)], -1)
+        # Сам агент всегда ближайший к себе - берем следующего
+        self_hit = cand[:, 0] == np.arange(n)
+        col = self_hit.astype(int) if k == 2 else np.zeros(n, dtype=int)
+        rows = np.arange(n)
+        idx = cand[rows, col]
+        dist = np.where(idx >= 0, d[rows, col], np.inf)
+        if k == 1:
+            idx[self_hit], dist[self_hit] = -1, np.inf
+        return dist, idx
+
+    def _nearest_cells(self, members, radius):
+        """Запасной путь без scipy: ближайший через CellList."""
+        n = len(self.pos)
+        dist, idx = np.full(n, np.inf), np.full(n, -1)
+        role = np.zeros(n, dtype=np.int8)
+        role[members] = 1
+        index = CellList(self.pos, radius, role)
+        for q in index.blocks(np.arange(n), radius):
+            i, j, _, d = index.pairs(radius, targets=(1,), query=q)
+            order = np.lexsort((d, i))
+            i, j, d = i[order], j[order], d[order]
+            first = np.r_[True, i[1:] != i[:-1]] if len(i) else np.zeros(0, dtype=bool)
+            dist[i[first]], idx[i[first]] = d[first], j[first]
+        return dist, idx
@@ -0,0 +1,111 @@
+import numpy as np
+
+# Роли по номеру кода (как в engine): счетчики популяции хранятся массивом из трех чисел
+ROLE_NAMES = ('souls', 'parasites', 'judges')
+
+
+class Rolling:
+    """Скользящее окно скаляра: сумма и сумма квадратов обновляются за O(1) на тик.
+
+    Среднее и дисперсия читаются за O(1); перцентили считаются по кольцу только при чтении.
+    """
+
+    def __init__(self, window):
+        self.buf = np.zeros(window)
+        self.head = 0
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, x):
+        buf = self.buf
+        if self.count == len(buf):
+            old = buf[self.head]
+            self.total -= old
+            self.squares -= old * old
+        else:
+            self.count += 1
+        buf[self.head] = x
+        self.total += x
+        self.squares += x * x
+        self.head = (self.head + 1) % len(buf)
+        if self.head == 0:
+            # Раз в окно пересчитываем суммы заново: ошибка вычитаний не копится
+            self.total, self.squares = float(buf.sum()), float(np.dot(buf, buf))
+
+    def values(self):
+        """Окно по порядку, от старых к новым."""
+        if self.count < len(self.buf):
+            return self.buf[:self.count]
+        return np.roll(self.buf, -self.head)
+
+    def last(self):
+        return float(self.buf[self.head - 1]) if self.count else 0.0
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def std(self):
+        if not self.count: return 0.0
+        m = self.mean()
+        return float(np.sqrt(max(0.0, self.squares / self.count - m * m)))
+
+    def percentile(self, q):
+        return np.percentile(self.values(), q) if self.count else np.zeros(np.shape(q))
+
+
+class PopulationStats:
+    """Сводные величины популяции, которые читаются за O(1).
+
+    Счетчики ролей меняются только там, где меняются роли (рождение, метаморфоза).
+    Суммы настроения, страха и энергии снимаются раз в тик, в его конце, и до следующего тика
+    служат глобальными gm/gf, метриками и журналом. Ряды за последние window тиков - в Rolling.
+    """
+
+    SERIES = ('mood', 'fear', 'energy', 'souls', 'parasites', 'judges', 'deaths')
+
+    def __init__(self, world, window=1000):
+        self.n = world.n
+        self.series = {name: Rolling(window) for name in self.SERIES}
+        self.refresh(world)
+
+    def refresh(self, world):
+        """Полный пересчет из массивов мира (после восстановления или правки массивов извне)."""
+        self.counts = np.bincount(world.role, minlength=3)
+        self.sums = {'mood': float(world.mood.sum()), 'fear': float(world.fear.sum()),
+                     'energy': float(world.energy.sum())}
+
+    def recount(self, old, new):
+        """Смена ролей у части агентов: old и new - их коды до и после."""
+        self.counts -= np.bincount(old, minlength=3)
+        self.counts += np.bincount(new, minlength=3)
+
+    def tick(self, world, deaths=0):
+        """Конец тика: суммы и точка в каждом ряду."""
+        sums = self.sums
+        sums['mood'], sums['fear'] = float(world.mood.sum()), float(world.fear.sum())
+        sums['energy'] = float(world.energy.sum())
+        series = self.series
+        for name in ('mood', 'fear', 'energy'):
+            series[name].push(sums[name] / self.n)
+        for code, name in enumerate(ROLE_NAMES):
+            series[name].push(self.counts[code])
+        series['deaths'].push(deaths)
+
+    def mean(self, name):
+        return self.sums[name] / self.n
+
+    def count(self, code):
+        return int(self.counts[code])
+
+    def summary(self, q=(5, 50, 95)):
+        """Ряды за окно: среднее, стандартное отклонение, перцентили."""
+        out = {}
+        for name, rolling in self.series.items():
+            p = rolling.percentile(q)
+            out[name] = {'mean': rolling.mean(), 'std': rolling.std(), 'last': rolling.last(),
+                         **{'p%d' % k: float(v) for k, v in zip(q, p)}}
+        return out
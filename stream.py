@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+
+import numpy as np
+
+try:
+    from aiohttp import WSMsgType, web
+except ImportError:
+    web = None
+
+from engine import FLAVORS, World, make_config
+from render import VIEWS
+from snapshot import SimulationThread, SnapshotExchange
+
+# Двоичный кадр (little-endian), все массивы выровнены для typed arrays в браузере:
+#   заголовок   32 байта: magic, версия, флаги, тик, n, точек хвоста T, квант, души, смерти
+#   pos         float32 (n, 3)      - головы
+#   tail        int16   (n, T-1, 3) - хвост от головы назад: точка[k] = точка[k+1] - tail[k] * квант
+#   length      uint8   (n,)        - сколько точек хвоста настоящие (остальные - с прошлой жизни)
+#   color       uint8   (n, 3), role int8 (n,), coupled uint8 (n,)
+HEADER = struct.Struct('<4sHHIIIfII')
+MAGIC, VERSION = b'UNIV', 1
+PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stream.html')
+
+
+def encode_tail(win, quantum):
+    """Дельты хвоста (n, T, 3) -> int16 (n, T-1, 3), от головы назад.
+
+    Кодирование по восстановленным точкам: ошибка каждой точки не больше кванта/2 и не копится.
+    """
+    n, t, _ = win.shape
+    deltas = np.zeros((n, t - 1, 3), dtype='<i2')
+    rec = win[:, -1].astype(np.float32)
+    for k in range(t - 2, -1, -1):
+        d = np.clip(np.rint((rec - win[:, k]) / quantum), -32767, 32767)
+        deltas[:, k] = d
+        rec = rec - (d * quantum).astype(np.float32)
+    return deltas
+
+
+def encode_frame(snap, tail=16, quantum=1 / 256):
+    """Снимок мира -> один двоичный кадр."""
+    t = min(tail, snap.trails.maxlen)
+    win = snap.trails.window()[:, -t:]
+    m = snap.metrics
+    header = HEADER.pack(MAGIC, VERSION, 0, snap.steps, snap.n, t, quantum, m.get('souls', 0), m.get('deaths', 0))
+    return b''.join([
+        header,
+        snap.pos.astype('<f4').tobytes(),
+        encode_tail(win, quantum).tobytes(),
+        np.minimum(snap.trails.length, t).astype(np.uint8).tobytes(),
+        np.clip(snap.color * 255, 0, 255).astype(np.uint8).tobytes(),
+        snap.role.astype(np.int8).tobytes(),
+        snap.coupled.astype(np.uint8).tobytes(),
+    ])
+
+
+def decode_frame(data):
+    """Обратное преобразование (для проверок и клиентов на Python)."""
+    magic, version, flags, steps, n, t, quantum, souls, deaths = HEADER.unpack_from(data)
+    if magic != MAGIC: raise ValueError('not a Universe frame')
+    off = HEADER.size
+    take = lambda dtype, count: np.frombuffer(data, dtype, count, off)
+    pos = take('<f4', n * 3).reshape(n, 3); off += pos.nbytes
+    deltas = take('<i2', n * (t - 1) * 3).reshape(n, t - 1, 3); off += deltas.nbytes
+    length = take(np.uint8, n); off += n
+    color = take(np.uint8, n * 3).reshape(n, 3); off += 3 * n
+    role = take(np.int8, n); off += n
+    coupled = take(np.uint8, n).astype(bool)
+    trail = np.empty((n, t, 3), dtype=np.float32)
+    trail[:, -1] = pos
+    for k in range(t - 2, -1, -1):
+        trail[:, k] = trail[:, k + 1] - deltas[:, k] * np.float32(quantum)
+    return {'steps': steps, 'n': n, 'pos': pos, 'trail': trail, 'length': length, 'color': color / 255.0,
+            'role': role, 'coupled': coupled, 'souls': souls, 'deaths': deaths}
+
+
+class Client:
+    """Один браузер: слот на один кадр. Новый кадр вытесняет неотправленный - отстающий теряет кадры."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.frame = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, frame):
+        if self.frame is not None:
+            self.dropped += 1
+        self.frame = frame
+        self.ready.set()
+
+    async def pump(self):
+        while not self.ws.closed:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.frame = self.frame, None
+            if frame is None: continue
+            try:
+                await self.ws.send_bytes(frame)
+            except ConnectionError:
+                return
+            self.sent += 1
+
+
+class StreamServer:
+    """Мир в потоке симуляции + рассылка кадров всем подключенным браузерам с частотой fps."""
+
+    def __init__(self, config, fps=20, tail=16):
+        if web is None:
+            raise ImportError('stream.py needs aiohttp (pip install aiohttp)')
+        self.world = World(config)
+        self.exchange = SnapshotExchange(self.world)
+        self.sim = SimulationThread(self.world, self.exchange)
+        self.fps, self.tail = fps, tail
+        self.clients = set()
+        self.frames = 0
+
+    def hello(self):
+        """Первое (текстовое) сообщение клиенту. Камера - та же, что у окна (render.VIEWS):
+        xy в [-lim, lim], z в [0, zlim]; bound мира для этого не годится (у genome его нет)."""
+        cfg = self.world.config
+        _, lim, zlim, elev, _ = VIEWS[cfg['flavor']]
+        return {'flavor': cfg['flavor'], 'n': cfg['n'], 'lim': lim, 'zlim': zlim, 'elev': elev,
+                'trail': cfg['trail'], 'tail': self.tail, 'fps': self.fps}
+
+    async def page(self, request):
+        return web.FileResponse(PAGE)
+
+    async def socket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        client = Client(ws)
+        self.clients.add(client)
+        await ws.send_str(json.dumps(self.hello()))
+        pump = asyncio.ensure_future(client.pump())
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR: break
+        finally:
+            self.clients.discard(client)
+            client.ready.set()
+            pump.cancel()
+        return ws
+
+    async def broadcast(self, app):
+        shown = -1
+        while True:
+            await asyncio.sleep(1.0 / self.fps)
+            if not self.clients: continue
+            snap = self.exchange.acquire()
+            if snap is None: continue
+            try:
+                if snap.steps == shown: continue
+                frame = encode_frame(snap, self.tail)
+                shown = snap.steps
+            finally:
+                self.exchange.release(snap)
+            self.frames += 1
+            for client in list(self.clients):
+                client.offer(frame)
+
+    async def start(self, app):
+        self.sim.start()
+        app['broadcast'] = asyncio.ensure_future(self.broadcast(app))
+
+    async def stop(self, app):
+        app['broadcast'].cancel()
+        for client in list(self.clients):
+            await client.ws.close()
+        self.sim.stop()
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/', self.page)
+        app.router.add_get('/ws', self.socket)
+        app.on_startup.append(self.start)
+        app.on_shutdown.append(self.stop)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a running Universe to browsers over websockets.')
+    parser.add_argument('--flavor', default='mood', choices=sorted(FLAVORS))
+    parser.add_argument('--n', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--fps', type=float, default=20)
+    parser.add_argument('--tail', type=int, default=16, help='trail points per agent in each frame')
+    args = parser.parse_args()
+
+    server = StreamServer(make_config(args.flavor, n=args.n, seed=args.seed), args.fps, args.tail)
+    print(f"--- Streaming {args.flavor} (n={args.n}) at http://{args.host}:{args.port}/ ---")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+
+import matplotlib
+
+# Используем TkAgg для стабильного рендеринга окна
+try:
+    matplotlib.use('TkAgg')
+except:
+    pass
+import matplotlib.pyplot as plt
+
+import time
+
+from engine import World, make_config
+from headless import journal
+from profiler import TickProfiler
+from render import VIEWS, Renderer
+from snapshot import SimulationThread, SnapshotExchange
+
+
+def run_universe(config, fps=30):
+    """Интерактивное окно - лишь один из потребителей движка.
+
+    Мир шагает в своем потоке на полной скорости и публикует снимки; окно с частотой fps
+    рисует последний из них. Медленный кадр не тормозит симуляцию, а симуляция - кадр.
+    """
+    world = World(config)
+    plt.ion()
+    fig = plt.figure(figsize=(12, 9))
+    fig.patch.set_facecolor('black')
+    ax = fig.add_subplot(111, projection='3d')
+    exchange = SnapshotExchange(world)
+    renderer = Renderer(ax, None, VIEWS[world.flavor])
+    # Профайлер тиков принадлежит потоку симуляции, у окна - свой, по кадрам
+    prof, frames = world.profiler, TickProfiler(window=300)
+
+    def on_key(event):
+        # 't' включает и выключает оба профайлера прямо во время прогона
+        if event.key == 't':
+            prof.enabled = frames.enabled = not prof.enabled
+            print(f" > Profiler {'on' if prof.enabled else 'off'}")
+
+    fig.canvas.mpl_connect('key_press_event', on_key)
+
+    def on_step(w):
+        if w.steps % 1000 == 0:
+            journal(w)
+            print(f" > Sim rate: {sim.rate:.0f} ticks/s | Frames drawn: {frames_drawn} | "
+                  f"Snapshots dropped: {exchange.dropped}")
+
+    sim = SimulationThread(world, exchange, on_step=on_step)
+    frames_drawn, shown = 0, -1
+    sim.start()
+    try:
+        while plt.fignum_exists(fig.number) and sim.is_alive():
+            started = time.perf_counter()
+            snap = exchange.acquire()
+            fresh = False
+            if snap is not None:
+                # Снимок возвращается всегда, и уже показанный тоже: иначе он занимает задний слот
+                try:
+                    if snap.steps != shown:
+                        with frames.phase('render'):
+                            renderer.world = snap
+                            renderer.update()
+                            fig.canvas.draw()  # Рисуем, пока снимок наш: после release его перепишут
+                        shown, fresh = snap.steps, True
+                finally:
+                    exchange.release(snap)
+            if fresh:
+                frames_drawn += 1
+                frames.end_tick(frames_drawn)
+                if frames.enabled and frames_drawn % 300 == 0:
+                    print(frames.report())
+            plt.pause(max(0.001, 1.0 / fps - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        print("\nSimulation Halted by Architect.")
+    finally:
+        sim.stop()
+        plt.ioff()
+
+
+if __name__ == "__main__":
+    flavor = sys.argv[1] if len(sys.argv) > 1 else 'mood'
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    run_universe(make_config(flavor, n=n))